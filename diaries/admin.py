@@ -1,9 +1,10 @@
 from django.contrib import admin
 
-from .models import User, Post, Subscription
+from .models import User, Post, Subscription, ContentSignature
 
 
 admin.site.register(User)
 admin.site.register(Post)
 admin.site.register(Subscription)
+admin.site.register(ContentSignature)
 
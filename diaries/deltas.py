@@ -0,0 +1,84 @@
+class DeltaError(ValueError):
+    '''Raised when a text delta cannot be applied to its base text.'''
+
+
+def _is_count(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def apply_delta(text: str, ops: list) -> str:
+    '''
+    Apply a text delta to `text` and return the result.
+
+    A delta is a list of `[position, delete_count, insert_text]` operations. Positions refer to
+    the base text, must be ascending and must not overlap, so clients can compute all operations
+    against the revision they started from.
+
+    Positions and counts are UTF-16 code units, like JavaScript string indices, so browsers can
+    send them as they are; operations that would split a surrogate pair are rejected.
+    '''
+
+    data = text.encode('utf-16-le')
+    length = len(data) // 2
+    pieces = []
+    cursor = 0
+    for op in ops:
+        if not isinstance(op, (list, tuple)) or len(op) != 3:
+            raise DeltaError('Each operation must be [position, delete_count, insert_text].')
+        position, delete_count, insert_text = op
+        if not _is_count(position) or not _is_count(delete_count) or not isinstance(insert_text, str):
+            raise DeltaError('Each operation must be [position, delete_count, insert_text].')
+        if position < cursor or delete_count < 0 or position + delete_count > length:
+            raise DeltaError('Operations must be ascending, non-overlapping and within the base text.')
+        pieces.append(data[cursor * 2:position * 2])
+        pieces.append(insert_text.encode('utf-16-le', 'surrogatepass'))
+        cursor = position + delete_count
+    pieces.append(data[cursor * 2:])
+    try:
+        return b''.join(pieces).decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise DeltaError('Operations must not split a surrogate pair.') from None
+
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _common_prefix_length(a: str, b: str, limit: int) -> int:
+    # Binary search over slice comparisons keeps the work in C for long texts.
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def diff_delta(old: str, new: str) -> list:
+    '''
+    Return a delta turning `old` into `new`: a single operation replacing the span between their
+    common prefix and common suffix, or no operation at all if they are equal.
+    '''
+
+    if old == new:
+        return []
+    prefix = _common_prefix_length(old, new, min(len(old), len(new)))
+    suffix = _common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    return [[
+        _utf16_length(old[:prefix]),
+        _utf16_length(old[prefix:len(old) - suffix]),
+        new[prefix:len(new) - suffix],
+    ]]
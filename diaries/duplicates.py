@@ -0,0 +1,145 @@
+import hashlib
+import re
+import zlib
+
+from functools import lru_cache
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import ContentSignature, SignatureBand
+
+
+TOKEN_RE = re.compile(r'\w+')
+MASK32 = np.uint64(0xFFFFFFFF)
+CHUNK_SHINGLES = 4096
+
+
+def _setting(name: str, default):
+    return getattr(settings, f'NEAR_DUPLICATE_{name}', default)
+
+
+@lru_cache(maxsize=None)
+def _permutations(count: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0x5EED)
+    a = rng.integers(1, 2**32, size=count, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**32, size=count, dtype=np.uint64)
+    return a, b
+
+
+def shingles(text: str, size: int) -> np.ndarray:
+    '''Return the distinct hashed word `size`-grams of `text` as uint32 values.'''
+
+    tokens = TOKEN_RE.findall(text.lower())
+    grams = {' '.join(tokens[i:i + size]) for i in range(max(len(tokens) - size + 1, 0))}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray | None:
+    '''
+    Return the MinHash signature of `text`, or None if it is too short to judge.
+
+    Each of the `BANDS * ROWS` hash functions is a random multiply-add over 32-bit shingle
+    hashes, evaluated for `CHUNK_SHINGLES` shingles at a time so memory stays bounded however
+    long the text is.
+    '''
+
+    hashed = shingles(text, _setting('SHINGLE_SIZE', 3))
+    if len(hashed) < _setting('MIN_SHINGLES', 5):
+        return None
+    a, b = _permutations(_setting('BANDS', 16) * _setting('ROWS', 8))
+    signature = np.full(len(a), MASK32, dtype=np.uint64)
+    for start in range(0, len(hashed), CHUNK_SHINGLES):
+        chunk = hashed[start:start + CHUNK_SHINGLES, None] * a
+        chunk += b
+        chunk &= MASK32
+        np.minimum(signature, chunk.min(axis=0), out=signature)
+    return signature.astype('<u4')
+
+
+def band_buckets(signature: np.ndarray) -> list[tuple[int, int]]:
+    '''Split a signature into `(band, bucket)` pairs; similar signatures share at least one.'''
+
+    rows = _setting('ROWS', 8)
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+            'little', signed=True,
+        ))
+        for band in range(len(signature) // rows)
+    ]
+
+
+class Screening:
+    '''The outcome of checking a text against the stored signatures.'''
+
+    def __init__(self, signature: np.ndarray | None, duplicate: ContentSignature | None = None,
+                 similarity: float | None = None):
+        self.signature = signature
+        self.duplicate = duplicate
+        self.similarity = similarity
+
+    @property
+    def is_duplicate(self) -> bool:
+        return self.duplicate is not None
+
+    @property
+    def should_reject(self) -> bool:
+        return self.is_duplicate and _setting('REJECT', False)
+
+
+def screen(text: str, exclude=None) -> Screening:
+    '''
+    Find the most similar stored text whose estimated Jaccard similarity reaches
+    `NEAR_DUPLICATE_THRESHOLD`, ignoring the object with uuid `exclude`.
+
+    Candidates sharing the most bands with `text` are compared first, up to
+    `NEAR_DUPLICATE_MAX_CANDIDATES` of them.
+    '''
+
+    signature = minhash(text)
+    if signature is None:
+        return Screening(None)
+    lookup = Q()
+    for band, bucket in band_buckets(signature):
+        lookup |= Q(bands__band=band, bands__bucket=bucket)
+    candidates = ContentSignature.objects.filter(lookup).annotate(
+        matches=Count('bands')
+    ).order_by('-matches').only('uuid', 'kind', 'object_uuid', 'signature')
+    if exclude is not None:
+        candidates = candidates.exclude(object_uuid=exclude)
+
+    best, best_similarity = None, 0.0
+    for candidate in candidates[:_setting('MAX_CANDIDATES', 50)]:
+        stored = np.frombuffer(bytes(candidate.signature), dtype='<u4')
+        if len(stored) != len(signature):
+            continue
+        similarity = float(np.mean(stored == signature))
+        if similarity > best_similarity:
+            best, best_similarity = candidate, similarity
+    if best is None or best_similarity < _setting('THRESHOLD', 0.8):
+        return Screening(signature)
+    return Screening(signature, best, best_similarity)
+
+
+@transaction.atomic
+def save_signature(kind: str, object_uuid, screening: Screening) -> None:
+    '''Store (or replace) the signature of a post or comment along with its screening result.'''
+
+    ContentSignature.objects.filter(kind=kind, object_uuid=object_uuid).delete()
+    if screening.signature is None:
+        return
+    stored = ContentSignature.objects.create(
+        kind=kind,
+        object_uuid=object_uuid,
+        signature=screening.signature.tobytes(),
+        duplicate_of=screening.duplicate.object_uuid if screening.is_duplicate else None,
+        similarity=screening.similarity,
+    )
+    SignatureBand.objects.bulk_create(
+        SignatureBand(signature=stored, band=band, bucket=bucket)
+        for band, bucket in band_buckets(screening.signature)
+    )
@@ -0,0 +1,212 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from collections import OrderedDict, defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+
+FEED_CHANNEL = 'feed'
+
+
+class ConnectionLimitExceeded(Exception):
+    '''Raised when a new stream would exceed the broadcaster's connection limits.'''
+
+
+class Event:
+    '''A single server-sent event, serialized once and shared by every listener.'''
+
+    __slots__ = ('id', 'name', 'payload')
+
+    def __init__(self, id: int, name: str, data):
+        self.id = id
+        self.name = name
+        self.payload = f'id: {id}\nevent: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+class Listener:
+    '''
+    An open stream on one channel; iterate it from the event loop that created it.
+
+    At most `queue_size` events wait to be sent. A client that falls further behind is
+    dropped: its queue is emptied, `get` returns None and the listener is unsubscribed, so
+    the client reconnects and resumes from `Last-Event-ID` instead of buffering without bound.
+    '''
+
+    def __init__(self, broadcaster: 'LocalBroadcaster', channel: str, owner, backlog: list[Event],
+                 queue_size: int = 100):
+        self.broadcaster = broadcaster
+        self.channel = channel
+        self.owner = owner
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+        for event in backlog[-queue_size:]:
+            self.queue.put_nowait(event)
+
+    def deliver(self, event: Event) -> None:
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: Event) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            self.close()
+
+    async def get(self) -> Event | None:
+        '''Return the next event, or None once the listener has been dropped for falling behind.'''
+
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.broadcaster.unsubscribe(self)
+
+
+class LocalBroadcaster:
+    '''
+    In-process event broadcaster for server-sent event streams.
+
+    Events are fanned out to listeners of the same process only; it is the stand-in for a
+    multi-process backend (e.g. Redis pub/sub), which can be plugged in through the
+    `EVENTS_BROADCASTER` setting by implementing `publish`, `subscribe` and `unsubscribe`.
+
+    Each channel keeps the last `history` events so reconnecting clients can resume from
+    `Last-Event-ID`; histories are kept for the `history_channels` most recently published
+    channels only, so memory stays bounded however many posts see activity. Events published with a `coalesce_key` are debounced: only the latest
+    one per key within `debounce` seconds is delivered. Listeners buffer at most `queue_size`
+    undelivered events before they are dropped.
+    '''
+
+    def __init__(self, history: int = 100, debounce: float = 0.5,
+                 max_connections: int = 1000, max_connections_per_user: int = 5, queue_size: int = 100,
+                 history_channels: int = 10000):
+        self.history = history
+        self.history_channels = history_channels
+        self.debounce = debounce
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.max_connections_per_user = max_connections_per_user
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._history = OrderedDict()
+        self._listeners = defaultdict(set)
+        self._connections = 0
+        self._connections_per_owner = defaultdict(int)
+        self._pending = {}
+
+    def publish(self, channels: list[str], name: str, data, coalesce_key: str | None = None) -> None:
+        '''Publish an event to `channels`; safe to call from any thread.'''
+
+        if coalesce_key is None or self.debounce <= 0:
+            self._dispatch(channels, name, data)
+            return
+        with self._lock:
+            scheduled = coalesce_key in self._pending
+            self._pending[coalesce_key] = (channels, name, data)
+        if not scheduled:
+            timer = threading.Timer(self.debounce, self._flush, [coalesce_key])
+            timer.daemon = True
+            timer.start()
+
+    def subscribe(self, channel: str, last_event_id: int | None = None, owner=None) -> Listener:
+        '''Open a listener on `channel`, replaying buffered events newer than `last_event_id`.'''
+
+        with self._lock:
+            if self._connections >= self.max_connections:
+                raise ConnectionLimitExceeded('Too many open event streams.')
+            if owner is not None and self._connections_per_owner.get(owner, 0) >= self.max_connections_per_user:
+                raise ConnectionLimitExceeded('Too many open event streams for this user.')
+            backlog = []
+            if last_event_id is not None:
+                backlog = [event for event in self._history.get(channel, ()) if event.id > last_event_id]
+            listener = Listener(self, channel, owner, backlog, self.queue_size)
+            self._listeners[channel].add(listener)
+            self._connections += 1
+            if owner is not None:
+                self._connections_per_owner[owner] += 1
+        return listener
+
+    def unsubscribe(self, listener: Listener) -> None:
+        with self._lock:
+            if listener not in self._listeners.get(listener.channel, ()):
+                return
+            self._listeners[listener.channel].discard(listener)
+            if not self._listeners[listener.channel]:
+                del self._listeners[listener.channel]
+            self._connections -= 1
+            if listener.owner is not None:
+                self._connections_per_owner[listener.owner] -= 1
+                if not self._connections_per_owner[listener.owner]:
+                    del self._connections_per_owner[listener.owner]
+
+    def _flush(self, coalesce_key: str) -> None:
+        with self._lock:
+            pending = self._pending.pop(coalesce_key, None)
+        if pending is not None:
+            self._dispatch(*pending)
+
+    def _dispatch(self, channels: list[str], name: str, data) -> None:
+        with self._lock:
+            event = Event(next(self._ids), name, data)
+            listeners = []
+            for channel in channels:
+                self._remember(channel, event)
+                listeners.extend(self._listeners.get(channel, ()))
+        for listener in listeners:
+            listener.deliver(event)
+
+    def _remember(self, channel: str, event: Event) -> None:
+        history = self._history.get(channel)
+        if history is None:
+            history = self._history[channel] = deque(maxlen=self.history)
+        else:
+            self._history.move_to_end(channel)
+        history.append(event)
+        while len(self._history) > self.history_channels:
+            self._history.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_broadcaster():
+    '''Return the process-wide broadcaster configured by the `EVENTS_*` settings.'''
+
+    broadcaster_class = import_string(getattr(settings, 'EVENTS_BROADCASTER', 'diaries.events.LocalBroadcaster'))
+    return broadcaster_class(
+        history=getattr(settings, 'EVENTS_HISTORY', 100),
+        debounce=getattr(settings, 'EVENTS_DEBOUNCE', 0.5),
+        max_connections=getattr(settings, 'EVENTS_MAX_CONNECTIONS', 1000),
+        max_connections_per_user=getattr(settings, 'EVENTS_MAX_CONNECTIONS_PER_USER', 5),
+        queue_size=getattr(settings, 'EVENTS_QUEUE_SIZE', 100),
+        history_channels=getattr(settings, 'EVENTS_HISTORY_CHANNELS', 10000),
+    )
+
+
+def post_channel(post_uuid) -> str:
+    return f'post:{post_uuid}'
+
+
+def publish_reactions(post) -> None:
+    '''Publish a post's current like/dislike counts, coalesced per post.'''
+
+    channels = [post_channel(post.uuid)] + ([FEED_CHANNEL] if post.is_public else [])
+    data = {'post': post.uuid, 'likes': post.likes, 'dislikes': post.dislikes}
+    get_broadcaster().publish(channels, 'reactions', data, coalesce_key=f'reactions:{post.uuid}')
+
+
+def publish_comment(comment, data) -> None:
+    '''Publish a newly created comment to its post's channel (and the feed for public posts).'''
+
+    post = comment.post
+    channels = [post_channel(post.uuid)] + ([FEED_CHANNEL] if post.is_public else [])
+    get_broadcaster().publish(channels, 'comment', data)
@@ -0,0 +1,82 @@
+import zlib
+
+from django import forms
+from django.conf import settings
+from django.db import models
+
+
+class CompressedTextField(models.BinaryField):
+    '''
+    Text field stored as bytes, zlib-compressed when it pays off.
+
+    Each stored value is prefixed with a one-byte marker (`z` for compressed, `r` for raw UTF-8),
+    so values written with compression disabled remain readable after enabling it and vice versa.
+
+    Settings:
+    POST_CONTENT_COMPRESSION (bool): Compress new values. Defaults to True.
+    POST_CONTENT_COMPRESSION_LEVEL (int): zlib level. Defaults to 6.
+    POST_CONTENT_COMPRESSION_MIN_SIZE (int): Values shorter than this (in bytes) are stored raw. Defaults to 256.
+    '''
+
+    COMPRESSED = b'z'
+    RAW = b'r'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.editable:
+            kwargs.pop('editable', None)
+        else:
+            kwargs['editable'] = False
+        return name, path, args, kwargs
+
+    @classmethod
+    def compress(cls, value: str) -> bytes:
+        raw = value.encode('utf-8')
+        enabled = getattr(settings, 'POST_CONTENT_COMPRESSION', True)
+        min_size = getattr(settings, 'POST_CONTENT_COMPRESSION_MIN_SIZE', 256)
+        if enabled and len(raw) >= min_size:
+            level = getattr(settings, 'POST_CONTENT_COMPRESSION_LEVEL', 6)
+            compressed = zlib.compress(raw, level)
+            if len(compressed) < len(raw):
+                return cls.COMPRESSED + compressed
+        return cls.RAW + raw
+
+    @classmethod
+    def decompress(cls, value: bytes) -> str:
+        value = bytes(value)
+        marker, payload = value[:1], value[1:]
+        if marker == cls.COMPRESSED:
+            payload = zlib.decompress(payload)
+        return payload.decode('utf-8')
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.decompress(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return self.decompress(value)
+
+    def get_default(self):
+        # BinaryField defaults to b''; this field holds text.
+        default = super().get_default()
+        return '' if default == b'' else default
+
+    def get_prep_value(self, value):
+        if value is None:
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            raise TypeError(f'{self.__class__.__name__} expects text, got {type(value).__name__}.')
+        return self.compress(str(value))
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': forms.CharField, 'widget': forms.Textarea, **kwargs})
@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from diaries.fields import CompressedTextField
+from diaries.models import Post, User
+
+
+WORDS = (
+    'today I walked along the river and thought about work family friends the weather '
+    'was cold but the coffee was warm and I finally finished the book I started last month '
+    'tomorrow I want to write more practice guitar and call my parents'
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway corpus of posts and report content storage size and read latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--words', type=int, default=800, help='Average words per post.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self._run(rng, options['posts'], options['words'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, rng: random.Random, count: int, words: int) -> None:
+        author = User.objects.create(username='bench-post-content', role='1')
+        contents = [
+            ' '.join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words * 3 // 2)))
+            for _ in range(count)
+        ]
+
+        started = time.perf_counter()
+        Post.objects.bulk_create(
+            Post(author=author, title=f'Entry {i}', content=content, is_public=True, category='personal_life')
+            for i, content in enumerate(contents)
+        )
+        write_time = time.perf_counter() - started
+
+        raw_bytes = sum(len(content.encode('utf-8')) for content in contents)
+        stored_bytes = sum(len(CompressedTextField.compress(content)) for content in contents)
+
+        queryset = Post.objects.filter(author=author)
+        started = time.perf_counter()
+        list(queryset.defer('content'))
+        list_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        total_chars = sum(len(post.content) for post in queryset)
+        full_time = time.perf_counter() - started
+
+        self.stdout.write(f'posts:                 {count} ({total_chars} chars)')
+        self.stdout.write(f'raw bytes/post:        {raw_bytes / count:.0f}')
+        self.stdout.write(f'stored bytes/post:     {stored_bytes / count:.0f} ({stored_bytes / raw_bytes:.1%} of raw)')
+        self.stdout.write(f'bulk insert:           {write_time * 1000:.1f} ms')
+        self.stdout.write(f'list read (deferred):  {list_time * 1000:.1f} ms')
+        self.stdout.write(f'full read (inflated):  {full_time * 1000:.1f} ms')
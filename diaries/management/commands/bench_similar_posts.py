@@ -0,0 +1,74 @@
+import random
+import tempfile
+import time
+import uuid
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from diaries.models import Post
+from diaries.similarity import SimilarPostsIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark building and querying the similar posts index on a synthetic corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--words', type=int, default=60, help='Words per synthetic post.')
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--dim', type=int, default=256)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--batch', type=int, default=16)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [f'w{i}' for i in range(options['vocabulary'])]
+        categories = [code for code, _ in Post.CATEGORY]
+        count = options['posts']
+
+        def corpus():
+            for i in range(count):
+                topic = rng.randrange(len(vocabulary) - 200)
+                words = [vocabulary[topic + rng.randrange(200)] for _ in range(options['words'])]
+                yield SimpleNamespace(
+                    uuid=uuid.UUID(int=rng.getrandbits(128)), title=f'Post {i}',
+                    content=' '.join(words), category=rng.choice(categories),
+                )
+
+        with tempfile.TemporaryDirectory() as path:
+            started = time.perf_counter()
+            index = SimilarPostsIndex.build(path, corpus(), count, options['dim'])
+            build_time = time.perf_counter() - started
+
+            samples = [uuid.UUID(bytes=bytes(raw).ljust(16, b'\0'))
+                       for raw in index.uuids[np.random.default_rng(0).integers(0, index.size, options['queries'])]]
+
+            latencies = []
+            for post_uuid in samples:
+                started = time.perf_counter()
+                index.most_similar([post_uuid], k=10)
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for start in range(0, len(samples), options['batch']):
+                index.most_similar(samples[start:start + options['batch']], k=10)
+            batch_time = (time.perf_counter() - started) / len(samples)
+
+            started = time.perf_counter()
+            for post_uuid in samples[:10]:
+                index.most_similar([post_uuid], k=10, category=categories[0])
+            category_time = (time.perf_counter() - started) / min(10, len(samples))
+
+            latencies.sort()
+            self.stdout.write(f'posts:                  {count} x {options["dim"]} dims '
+                              f'({index.vectors.nbytes / 2**20:.0f} MiB vectors)')
+            self.stdout.write(f'build:                  {build_time:.1f} s ({count / build_time:.0f} posts/s)')
+            self.stdout.write(f'query p50 / p95:        {latencies[len(latencies) // 2] * 1000:.1f} / '
+                              f'{latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms')
+            self.stdout.write(f'batched ({options["batch"]}) per query: {batch_time * 1000:.1f} ms')
+            self.stdout.write(f'category filtered:      {category_time * 1000:.1f} ms')
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from diaries.duplicates import band_buckets, minhash
+from diaries.models import Comment, ContentSignature, Post, SignatureBand
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MinHash/LSH signatures used for near-duplicate detection of posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='Similarity for flagging duplicates (defaults to NEAR_DUPLICATE_THRESHOLD).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        threshold = options['threshold'] or settings.NEAR_DUPLICATE_THRESHOLD
+        batch_size = options['batch_size']
+        sources = (
+            ('post', Post.objects.order_by('created_at').only('uuid', 'content')),
+            ('comment', Comment.objects.order_by('created_at').only('uuid', 'content')),
+        )
+        started = time.perf_counter()
+        buckets, signatures = {}, {}
+        flagged = total = 0
+
+        with transaction.atomic():
+            ContentSignature.objects.all().delete()
+            pending = []
+            for kind, queryset in sources:
+                for obj in queryset.iterator(chunk_size=batch_size):
+                    signature = minhash(obj.content)
+                    if signature is None:
+                        continue
+                    bands = band_buckets(signature)
+                    duplicate_of, similarity = self._best_match(signature, bands, buckets, signatures, threshold)
+                    for key in bands:
+                        buckets.setdefault(key, []).append(obj.uuid)
+                    signatures[obj.uuid] = signature
+                    pending.append((ContentSignature(
+                        kind=kind, object_uuid=obj.uuid, signature=signature.tobytes(),
+                        duplicate_of=duplicate_of, similarity=similarity,
+                    ), bands))
+                    flagged += duplicate_of is not None
+                    total += 1
+                    if len(pending) >= batch_size:
+                        self._flush(pending)
+            self._flush(pending)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Signed {total} posts and comments, flagged {flagged} near-duplicates '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    @staticmethod
+    def _best_match(signature, bands, buckets, signatures, threshold):
+        candidates = {uuid for key in bands for uuid in buckets.get(key, ())}
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = float(np.mean(signatures[candidate] == signature))
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < threshold:
+            return None, None
+        return best, best_similarity
+
+    @staticmethod
+    def _flush(pending):
+        ContentSignature.objects.bulk_create([signature for signature, _ in pending])
+        SignatureBand.objects.bulk_create(
+            SignatureBand(signature=signature, band=band, bucket=bucket)
+            for signature, bands in pending
+            for band, bucket in bands
+        )
+        pending.clear()
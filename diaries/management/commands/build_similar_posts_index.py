@@ -0,0 +1,36 @@
+import time
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from diaries.models import Post
+from diaries.similarity import SimilarPostsIndex, index_path
+
+
+CHANGED_MARGIN = timedelta(minutes=5)
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped TF-IDF index used by the similar posts endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dim', type=int, default=settings.SIMILAR_POSTS_DIM)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Edits committed while the build reads the posts may carry an earlier `updated_at`.
+        since = timezone.now() - CHANGED_MARGIN
+        fields = ('uuid', 'title', 'content', 'category', 'is_public')
+        posts = Post.objects.filter(is_public=True).only(*fields)
+        count = posts.count()
+        started = time.perf_counter()
+        index = SimilarPostsIndex.build(
+            index_path(), posts.iterator(chunk_size=options['chunk_size']), count, options['dim'],
+            changed=lambda: Post.objects.filter(updated_at__gte=since).only(*fields).iterator(),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {index.size} posts into {index.path} in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+import diaries.fields
+
+
+def compress_content(apps, schema_editor):
+    Post = apps.get_model('diaries', 'Post')
+    for post in Post.objects.only('uuid', 'content').iterator(chunk_size=500):
+        Post.objects.filter(uuid=post.uuid).update(content_data=post.content)
+
+
+def decompress_content(apps, schema_editor):
+    Post = apps.get_model('diaries', 'Post')
+    for post in Post.objects.only('uuid', 'content_data').iterator(chunk_size=500):
+        Post.objects.filter(uuid=post.uuid).update(content=post.content_data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diaries', '0002_rename_id_comment_uuid_rename_id_dislike_uuid_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='content',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_data',
+            field=diaries.fields.CompressedTextField(null=True),
+        ),
+        migrations.RunPython(compress_content, decompress_content),
+        migrations.RemoveField(
+            model_name='post',
+            name='content',
+        ),
+        migrations.RenameField(
+            model_name='post',
+            old_name='content_data',
+            new_name='content',
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='content',
+            field=diaries.fields.CompressedTextField(),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 09:46
+
+import diaries.fields
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diaries', '0003_compress_post_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PostRevision',
+            fields=[
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('number', models.PositiveIntegerField()),
+                ('delta', models.JSONField(blank=True, null=True)),
+                ('snapshot', diaries.fields.CompressedTextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='diaries.post')),
+            ],
+            options={
+                'verbose_name': 'Post revision',
+                'verbose_name_plural': 'Post revisions',
+                'unique_together': {('post', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 09:54
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diaries', '0004_post_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSignature',
+            fields=[
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment')], max_length=16)),
+                ('object_uuid', models.UUIDField()),
+                ('signature', models.BinaryField()),
+                ('duplicate_of', models.UUIDField(blank=True, null=True)),
+                ('similarity', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Content signature',
+                'verbose_name_plural': 'Content signatures',
+                'unique_together': {('kind', 'object_uuid')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('signature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='diaries.contentsignature')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='diaries_sig_band_181c73_idx')],
+            },
+        ),
+    ]
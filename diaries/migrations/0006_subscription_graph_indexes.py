@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 09:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diaries', '0005_content_signatures'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscription',
+            name='subscribed_to',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='subscriber',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscriber', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscribed_to', 'subscriber'], name='subscription_followers_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 import uuid
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 
+from .deltas import apply_delta, diff_delta
+from .fields import CompressedTextField
+
 
 class User(AbstractUser):
     ''' Model for User '''
@@ -23,6 +26,27 @@ class User(AbstractUser):
         return self.username
 
 
+class PostQuerySet(models.QuerySet):
+    ''' QuerySet for Post with viewer-specific annotations '''
+
+    def with_viewer_reactions(self, user):
+        '''
+        Annotate each post with whether `user` has liked or disliked it.
+
+        Both flags are computed with correlated EXISTS subqueries, so the whole
+        page is still fetched in a single query.
+        '''
+
+        return self.annotate(
+            viewer_liked=models.Exists(
+                Like.objects.filter(post=models.OuterRef('pk'), author=user)
+            ),
+            viewer_disliked=models.Exists(
+                Dislike.objects.filter(post=models.OuterRef('pk'), author=user)
+            ),
+        )
+
+
 class Post(models.Model):
     '''
     Model for creating posts.
@@ -34,13 +58,17 @@ class Post(models.Model):
     uuid (UUID): A unique identifier for the post, generated automatically.
     author (ForeignKey): A foreign key to the User model, indicating the post's author.
     title (str): The title of the post.
-    content (str): The content of the post.
+    content (str): The content of the post, stored compressed (see `CompressedTextField`).
     created_at (datetime): The timestamp when the post was created.
     updated_at (datetime): The timestamp of the last update to the post.
     is_public (bool): Indicates whether the post is public.
     category (str): The category of the post, selected from a predefined list of categories.
     likes (int): The number of likes on the post.
     dislikes (int): The number of dislikes on the post.
+    revision (int): The current revision number, incremented on every content edit.
+
+    Managers:
+    objects (PostQuerySet): Default manager, exposes `with_viewer_reactions(user)`.
 
     Methods:
     __str__(): Returns the title of the post as its string representation.
@@ -76,22 +104,138 @@ class Post(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='author')
     title = models.CharField(max_length=255)
-    content = models.TextField()
+    content = CompressedTextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_public = models.BooleanField()
     category = models.CharField(max_length=255, choices=CATEGORY)
     likes = models.PositiveIntegerField(default=0)
     dislikes = models.PositiveIntegerField(default=0)
+    revision = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        post._recorded_content = post.__dict__.get('content')
+        return post
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if 'content' in self.__dict__:
+            self._recorded_content = self.content
+
+    def save(self, *args, **kwargs):
+        '''
+        Save the post; content changed without `save_revision` (e.g. in the admin) is recorded
+        in the history as well, so later deltas are replayed against the right base.
+        '''
+
+        base = getattr(self, '_recorded_content', None)
+        update_fields = kwargs.get('update_fields')
+        edited = (
+            base is not None and 'content' in self.__dict__ and self.content != base
+            and (update_fields is None or 'content' in update_fields)
+        )
+        if not edited:
+            super().save(*args, **kwargs)
+        else:
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'revision'}
+            with transaction.atomic():
+                self.revision += 1
+                super().save(*args, **kwargs)
+                self._record_revision(base)
+        self._recorded_content = self.__dict__.get('content')
+
+    def save_revision(self, content: str, delta: list | None = None) -> None:
+        '''
+        Replace the content, bump the revision number and record the edit in the history.
+
+        Pass the `delta` that produced `content`; full edits are diffed against the current
+        content, so either way the revision only stores what changed (plus a snapshot every
+        `PostRevision.SNAPSHOT_INTERVAL` revisions). The `content` column itself is still
+        rewritten in full, as it is a single compressed value. Call on a row locked with
+        `select_for_update()`.
+        '''
+
+        base = self.content
+        self.content = content
+        self.revision += 1
+        self._recorded_content = content
+        self.save(update_fields=['content', 'revision', 'updated_at'])
+        self._record_revision(base, delta)
+
+    def _record_revision(self, base: str, delta: list | None = None) -> None:
+        if not self.revisions.exists():
+            PostRevision.objects.create(post=self, number=self.revision - 1, snapshot=base)
+        PostRevision.objects.create(
+            post=self,
+            number=self.revision,
+            delta=diff_delta(base, self.content) if delta is None else delta,
+            snapshot=self.content if self.revision % PostRevision.SNAPSHOT_INTERVAL == 0 else None,
+        )
+
+    def content_at(self, number: int) -> str:
+        '''Rebuild the content of revision `number` from the nearest snapshot and the deltas after it.'''
+
+        snapshot = (
+            self.revisions.filter(number__lte=number, snapshot__isnull=False)
+            .order_by('-number').first()
+        )
+        if snapshot is None:
+            raise PostRevision.DoesNotExist(f'No snapshot at or before revision {number}.')
+        content = snapshot.snapshot
+        deltas = self.revisions.filter(number__gt=snapshot.number, number__lte=number).order_by('number')
+        for revision in deltas.only('delta'):
+            content = apply_delta(content, revision.delta)
+        return content
+
     class Meta:
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
 
 
+class PostRevision(models.Model):
+    '''
+    Model for storing the edit history of a post.
+
+    Most revisions only hold the delta that produced them from the previous revision; every
+    `SNAPSHOT_INTERVAL` revisions (and for the first recorded revision) the full content is stored
+    as well, so any revision can be rebuilt without replaying the whole history. Content edits
+    made through `Post.save()` are recorded too; queryset `update()` calls bypass the history.
+
+    Attributes:
+    uuid (UUID): A unique identifier for the revision.
+    post (ForeignKey): A foreign key to the `Post` model, indicating which post was edited.
+    number (int): The revision number of the post after this edit.
+    delta (list): The `[position, delete_count, insert_text]` operations applied to the previous revision.
+    snapshot (str): The full content at this revision, or None for delta-only revisions.
+    created_at (datetime): The timestamp when the revision was created.
+
+    Meta:
+    unique_together (tuple): Ensures that each revision number is unique per post.
+    '''
+
+    SNAPSHOT_INTERVAL = 20
+
+    uuid = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    delta = models.JSONField(null=True, blank=True)
+    snapshot = CompressedTextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Post revision'
+        verbose_name_plural = 'Post revisions'
+        unique_together = ('post', 'number')
+
+
 class Subscription(models.Model):
     '''
     Model for managing subscriptions between users.
@@ -107,14 +251,18 @@ class Subscription(models.Model):
 
     Meta:
     unique_together (tuple): Ensures that each subscription (between a subscriber and a subscribed user) is unique.
+        Its index on `(subscriber, subscribed_to)` serves "following" lists.
+    indexes (list): An index on `(subscribed_to, subscriber)` serving "followers" lists. Together the two
+        composite indexes cover every graph query, so the single-column foreign key indexes are dropped.
     '''
 
     uuid = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
-    subscriber = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriber')
-    subscribed_to = models.ForeignKey(User, on_delete=models.CASCADE)
+    subscriber = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriber', db_index=False)
+    subscribed_to = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
 
     class Meta:
         unique_together = ('subscriber', 'subscribed_to')
+        indexes = [models.Index(fields=['subscribed_to', 'subscriber'], name='subscription_followers_idx')]
 
 
 class Comment(models.Model):
@@ -200,4 +348,61 @@ class Dislike(models.Model):
     class Meta:
         verbose_name = 'Dislike'
         verbose_name_plural = 'Dislikes'
-        unique_together = ('author', 'post')
\ No newline at end of file
+        unique_together = ('author', 'post')
+
+
+class ContentSignature(models.Model):
+    '''
+    Model for storing MinHash signatures of post and comment text.
+
+    Signatures are split into LSH bands (`SignatureBand`), so near-duplicates of a new submission
+    are found with one indexed lookup instead of comparing against every stored text.
+
+    Attributes:
+    uuid (UUID): A unique identifier for the signature.
+    kind (str): Whether the signed object is a post or a comment.
+    object_uuid (UUID): The uuid of the signed post or comment.
+    signature (bytes): The MinHash signature, as little-endian uint32 values.
+    duplicate_of (UUID): The uuid of the most similar earlier post or comment, if it is a near-duplicate.
+    similarity (float): The estimated Jaccard similarity to `duplicate_of`.
+    updated_at (datetime): The timestamp of the last time the signature was computed.
+
+    Meta:
+    unique_together (tuple): Ensures that each object has a single signature.
+    '''
+
+    KINDS = (
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+    )
+
+    uuid = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_uuid = models.UUIDField()
+    signature = models.BinaryField()
+    duplicate_of = models.UUIDField(null=True, blank=True)
+    similarity = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Content signature'
+        verbose_name_plural = 'Content signatures'
+        unique_together = ('kind', 'object_uuid')
+
+
+class SignatureBand(models.Model):
+    '''
+    Model for storing the LSH band buckets of a content signature.
+
+    Attributes:
+    signature (ForeignKey): A foreign key to the `ContentSignature` the band belongs to.
+    band (int): The band number.
+    bucket (int): The hash of the signature rows in this band.
+    '''
+
+    signature = models.ForeignKey(ContentSignature, on_delete=models.CASCADE, related_name='bands')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'bucket'])]
@@ -1,21 +1,55 @@
+from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
-from .models import Post, Subscription, Comment
+from .models import Post, Subscription, Comment, User
 
 
 class PostSerializer(ModelSerializer):
+    content = serializers.CharField()
+    viewer_liked = serializers.BooleanField(read_only=True)
+    viewer_disliked = serializers.BooleanField(read_only=True)
+
     class Meta:
         model = Post
         fields = '__all__'
 
 
+class PostListSerializer(PostSerializer):
+    '''Post representation for list endpoints; content is deferred and left out.'''
+
+    content = None
+
+    class Meta:
+        model = Post
+        exclude = ('content',)
+
+
 class SubscriptionSerializer(ModelSerializer):
     class Meta:
         model = Subscription
         fields = '__all__'
 
 
+class UserSummarySerializer(ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username')
+
+
 class CommentSerializer(ModelSerializer):
     class Meta:
         model = Comment
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class ReactionStatusSerializer(serializers.Serializer):
+    uuids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=100)
+
+
+class PostDeltaSerializer(serializers.Serializer):
+    base_revision = serializers.IntegerField(min_value=0)
+    ops = serializers.ListField(child=serializers.ListField(min_length=3, max_length=3), max_length=1000)
+
+
+class FollowStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=200)
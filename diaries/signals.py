@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Comment, ContentSignature, Post
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def forget_signature(sender, instance, **kwargs) -> None:
+    '''Drop the near-duplicate signature of a post or comment, including cascaded and admin deletes.'''
+
+    kind = 'post' if sender is Post else 'comment'
+    ContentSignature.objects.filter(kind=kind, object_uuid=instance.uuid).delete()
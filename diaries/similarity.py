@@ -0,0 +1,354 @@
+import fcntl
+import json
+import os
+import re
+import uuid
+import zlib
+
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from django.conf import settings
+
+
+TOKEN_RE = re.compile(r'\w+')
+BLOCK_ROWS = 65536
+EMPTY = -1
+
+
+@lru_cache(maxsize=200_000)
+def _feature(token: str) -> tuple[int, float]:
+    '''Hash a token to a (bucket, sign) pair; the sign keeps hash collisions from only adding up.'''
+
+    digest = zlib.crc32(token.encode('utf-8'))
+    return digest >> 1, -1.0 if digest & 1 else 1.0
+
+
+def term_counts(text: str, dim: int) -> np.ndarray:
+    '''Return the signed, hashed term-frequency vector of `text`.'''
+
+    features = [_feature(token) for token in TOKEN_RE.findall(text.lower())]
+    if not features:
+        return np.zeros(dim, dtype=np.float32)
+    buckets, signs = zip(*features)
+    return np.bincount(np.array(buckets) % dim, weights=signs, minlength=dim).astype(np.float32)
+
+
+def _key(post_uuid: uuid.UUID) -> bytes:
+    # NumPy 'S16' values drop trailing NUL bytes, so keys are compared in that form.
+    return post_uuid.bytes.rstrip(b'\0')
+
+
+def _uuid(raw: bytes) -> uuid.UUID:
+    return uuid.UUID(bytes=bytes(raw).ljust(16, b'\0'))
+
+
+def post_text(post) -> str:
+    return f'{post.title}\n{post.content}'
+
+
+def category_code(category: str) -> int:
+    from .models import Post
+
+    return [code for code, _ in Post.CATEGORY].index(category)
+
+
+class SimilarPostsIndex:
+    '''
+    Memory-mapped TF-IDF index of public posts for "similar posts" lookups.
+
+    Posts are embedded as hashed-feature TF-IDF vectors (`dim` buckets, L2-normalized) and
+    stored row by row in `vectors.npy`, next to their uuids and category codes. All files are
+    memory-mapped, so workers share pages through the OS cache and in-place updates made by one
+    process are seen by the others. Rows are appended for new posts and blanked (category -1)
+    for removed ones; `meta.json` tracks the used size and a generation that changes whenever
+    the files are rebuilt or grown.
+
+    Build it offline with `manage.py build_similar_posts_index`; afterwards views keep it up to
+    date through `index_post` and `unindex_post`.
+    '''
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._generation = None
+        self._load()
+
+    # ------------ Building ------------
+
+    @classmethod
+    def build(cls, path: Path, posts, count: int, dim: int, changed=None) -> 'SimilarPostsIndex':
+        '''
+        Build a fresh index at `path` from an iterable of about `count` posts.
+
+        The files grow as needed if more posts turn up than counted. `changed`, if given, is
+        called once the new files are in place, while the index is still locked, and returns the
+        posts created or edited since the build started; they are applied to the new index so
+        edits indexed into the old files meanwhile are not lost.
+        '''
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        capacity = max(count, 1024)
+        vectors, uuids, categories = cls._allocate(path, capacity, dim, suffix='.tmp')
+        document_frequency = np.zeros(dim, dtype=np.int64)
+
+        size = 0
+        for post in posts:
+            if size == len(vectors):
+                vectors, uuids, categories = cls._copy_grown(path, (vectors, uuids, categories), size, dim)
+            counts = term_counts(post_text(post), dim)
+            vectors[size] = counts
+            uuids[size] = post.uuid.bytes
+            categories[size] = category_code(post.category)
+            document_frequency += counts != 0
+            size += 1
+
+        idf = (np.log((1 + size) / (1 + document_frequency)) + 1).astype(np.float32)
+        for start in range(0, size, BLOCK_ROWS):
+            block = vectors[start:min(start + BLOCK_ROWS, size)]
+            block *= idf
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            block /= np.where(norms == 0, 1, norms)
+        for array in (vectors, uuids, categories):
+            array.flush()
+        with open(path / 'idf.npy.tmp', 'wb') as f:
+            np.save(f, idf, allow_pickle=False)
+
+        with cls._lock(path):
+            for name in ('vectors.npy', 'uuids.npy', 'categories.npy'):
+                os.replace(path / f'{name}.tmp', path / name)
+            os.replace(path / 'idf.npy.tmp', path / 'idf.npy')
+            cls._write_meta(path, size=size, dim=dim, generation=uuid.uuid4().hex)
+            index = cls(path)
+            if changed is not None:
+                for post in changed():
+                    if post.is_public:
+                        index._upsert(post, index.vectorize(post_text(post)))
+                    else:
+                        index._remove(post.uuid)
+        return index
+
+    @classmethod
+    def _copy_grown(cls, path: Path, arrays: tuple, size: int, dim: int) -> tuple:
+        '''Copy the first `size` rows of the `.tmp` arrays into new `.tmp` files twice as large.'''
+
+        grown = cls._allocate(path, len(arrays[0]) * 2, dim, suffix='.grow')
+        for target, source in zip(grown, arrays):
+            target[:size] = source[:size]
+            target.flush()
+        for name in ('vectors.npy', 'uuids.npy', 'categories.npy'):
+            os.replace(path / f'{name}.grow', path / f'{name}.tmp')
+        return grown
+
+    @staticmethod
+    def _allocate(path: Path, capacity: int, dim: int, suffix: str = ''):
+        vectors = np.lib.format.open_memmap(
+            path / f'vectors.npy{suffix}', mode='w+', dtype=np.float32, shape=(capacity, dim)
+        )
+        uuids = np.lib.format.open_memmap(path / f'uuids.npy{suffix}', mode='w+', dtype='S16', shape=(capacity,))
+        categories = np.lib.format.open_memmap(
+            path / f'categories.npy{suffix}', mode='w+', dtype=np.int16, shape=(capacity,)
+        )
+        categories[:] = EMPTY
+        return vectors, uuids, categories
+
+    @staticmethod
+    def _write_meta(path: Path, **meta) -> None:
+        (path / 'meta.json.tmp').write_text(json.dumps(meta))
+        os.replace(path / 'meta.json.tmp', path / 'meta.json')
+
+    @staticmethod
+    @contextmanager
+    def _lock(path: Path):
+        with open(path / 'lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ------------ Loading ------------
+
+    def _read_meta(self) -> dict:
+        return json.loads((self.path / 'meta.json').read_text())
+
+    def _load(self, meta: dict | None = None) -> None:
+        meta = meta or self._read_meta()
+        self.dim = meta['dim']
+        self.size = meta['size']
+        if meta['generation'] != self._generation:
+            self._generation = meta['generation']
+            self.vectors = np.load(self.path / 'vectors.npy', mmap_mode='r+')
+            self.uuids = np.load(self.path / 'uuids.npy', mmap_mode='r+')
+            self.categories = np.load(self.path / 'categories.npy', mmap_mode='r+')
+            self.idf = np.load(self.path / 'idf.npy')
+            self._sorted_rows = np.argsort(self.uuids[:self.size], kind='stable')
+            self._sorted_uuids = self.uuids[self._sorted_rows]
+            self._appended = {}
+        for row in range(len(self._sorted_rows) + len(self._appended), self.size):
+            self._appended[bytes(self.uuids[row])] = row
+
+    def refresh(self) -> None:
+        '''
+        Pick up rows appended or files rebuilt by other processes.
+
+        `meta.json` is read and compared rather than stat'ed: its mtime can be too coarse to tell
+        two quick writes apart, and a writer must never append at a stale size.
+        '''
+
+        meta = self._read_meta()
+        if meta['size'] != self.size or meta['generation'] != self._generation:
+            self._load(meta)
+
+    def row_of(self, post_uuid: uuid.UUID) -> int | None:
+        key = _key(post_uuid)
+        if key in self._appended:
+            return self._appended[key]
+        position = np.searchsorted(self._sorted_uuids, key)
+        if position < len(self._sorted_uuids) and self._sorted_uuids[position] == key:
+            return int(self._sorted_rows[position])
+        return None
+
+    # ------------ Incremental updates ------------
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = term_counts(text, self.dim) * self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def upsert(self, post) -> None:
+        '''Insert or refresh a post's row in place, growing the files when they are full.'''
+
+        vector = self.vectorize(post_text(post))
+        with self._lock(self.path):
+            self.refresh()
+            self._upsert(post, vector)
+
+    def _upsert(self, post, vector: np.ndarray) -> None:
+        row = self.row_of(post.uuid)
+        if row is None:
+            if self.size == len(self.vectors):
+                self._grow()
+            row = self.size
+            self.uuids[row] = post.uuid.bytes
+            self.size += 1
+            self._appended[_key(post.uuid)] = row
+        self.vectors[row] = vector
+        self.categories[row] = category_code(post.category)
+        self._write_meta(self.path, size=self.size, dim=self.dim, generation=self._generation)
+
+    def remove(self, post_uuid: uuid.UUID) -> None:
+        '''Blank a post's row so it no longer shows up in results.'''
+
+        with self._lock(self.path):
+            self.refresh()
+            self._remove(post_uuid)
+
+    def _remove(self, post_uuid: uuid.UUID) -> None:
+        row = self.row_of(post_uuid)
+        if row is not None:
+            self.categories[row] = EMPTY
+
+    def _grow(self) -> None:
+        capacity = len(self.vectors) * 2
+        vectors, uuids, categories = self._allocate(self.path, capacity, self.dim, suffix='.tmp')
+        vectors[:self.size] = self.vectors[:self.size]
+        uuids[:self.size] = self.uuids[:self.size]
+        categories[:self.size] = self.categories[:self.size]
+        for array in (vectors, uuids, categories):
+            array.flush()
+        for name in ('vectors.npy', 'uuids.npy', 'categories.npy'):
+            os.replace(self.path / f'{name}.tmp', self.path / name)
+        self._generation = None
+        self._write_meta(self.path, size=self.size, dim=self.dim, generation=uuid.uuid4().hex)
+        self._load()
+
+    # ------------ Queries ------------
+
+    def most_similar(self, post_uuids: list[uuid.UUID], k: int = 10,
+                     category: str | None = None) -> dict[uuid.UUID, list[tuple[uuid.UUID, float]]]:
+        '''
+        Return the top `k` (uuid, cosine similarity) pairs for each of `post_uuids`.
+
+        All queries are scored together against each block of rows with one matrix product,
+        so the index is scanned once per call regardless of how many posts are asked for.
+        '''
+
+        self.refresh()
+        rows = {post_uuid: self.row_of(post_uuid) for post_uuid in post_uuids}
+        known = [post_uuid for post_uuid, row in rows.items() if row is not None]
+        results = {post_uuid: [] for post_uuid in post_uuids}
+        if not known or not self.size:
+            return results
+
+        query_rows = np.array([rows[post_uuid] for post_uuid in known])
+        queries = np.asarray(self.vectors[query_rows])
+        wanted = category_code(category) if category is not None else None
+        best_scores = np.full((len(known), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(known), 0), dtype=np.int64)
+
+        for start in range(0, self.size, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.size)
+            scores = queries @ self.vectors[start:end].T
+            categories = self.categories[start:end]
+            excluded = categories == EMPTY if wanted is None else categories != wanted
+            scores[:, excluded] = -np.inf
+            own = (query_rows >= start) & (query_rows < end)
+            scores[own.nonzero()[0], query_rows[own] - start] = -np.inf
+
+            take = min(k, end - start)
+            candidates = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, candidates + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        for i, post_uuid in enumerate(known):
+            for j in order[i]:
+                score = float(best_scores[i, j])
+                if score == -np.inf:
+                    break
+                results[post_uuid].append((_uuid(self.uuids[best_rows[i, j]]), score))
+        return results
+
+
+def index_path() -> Path:
+    return Path(settings.SIMILAR_POSTS_INDEX_DIR)
+
+
+@lru_cache(maxsize=None)
+def _open_index(path: Path) -> SimilarPostsIndex:
+    return SimilarPostsIndex(path)
+
+
+def get_index() -> SimilarPostsIndex | None:
+    '''Return the process-wide index, or None if it has not been built yet.'''
+
+    path = index_path()
+    if not (path / 'meta.json').exists():
+        return None
+    return _open_index(path)
+
+
+def index_post(post) -> None:
+    '''Keep the index in line with a created or updated post.'''
+
+    index = get_index()
+    if index is None:
+        return
+    if post.is_public:
+        index.upsert(post)
+    else:
+        index.remove(post.uuid)
+
+
+def unindex_post(post_uuid: uuid.UUID) -> None:
+    index = get_index()
+    if index is not None:
+        index.remove(post_uuid)
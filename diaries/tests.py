@@ -1,3 +1,549 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import uuid
 
-# Create your tests here.
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from mind_stream.profiling import RequestProfilingMiddleware, captures
+
+from . import duplicates
+from .deltas import DeltaError, apply_delta
+from .duplicates import band_buckets, minhash
+from .events import ConnectionLimitExceeded, LocalBroadcaster
+from .models import User, Post, PostRevision, Like, Dislike, Comment, ContentSignature, SignatureBand, Subscription
+from .similarity import SimilarPostsIndex
+
+
+class ViewerReactionsTests(TestCase):
+    '''Per-viewer reaction flags must not cost a query per post.'''
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='pass', role='1')
+        self.author = User.objects.create_user(username='author', password='pass', role='1')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, title=f'Post {i}', content='text',
+                is_public=True, category='books',
+            )
+            for i in range(10)
+        ]
+        Like.objects.create(post=self.posts[0], author=self.viewer)
+        Dislike.objects.create(post=self.posts[1], author=self.viewer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_post_list_flags_use_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('post_list'))
+        flags = {item['uuid']: (item['viewer_liked'], item['viewer_disliked']) for item in response.data}
+        self.assertEqual(flags[str(self.posts[0].uuid)], (True, False))
+        self.assertEqual(flags[str(self.posts[1].uuid)], (False, True))
+        self.assertEqual(flags[str(self.posts[2].uuid)], (False, False))
+
+    def test_reaction_status_batch_uses_constant_queries(self):
+        uuids = [str(post.uuid) for post in self.posts]
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('post_reactions'), {'uuids': uuids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[uuids[0]], {'liked': True, 'disliked': False})
+        self.assertEqual(response.data[uuids[1]], {'liked': False, 'disliked': True})
+        self.assertEqual(response.data[uuids[2]], {'liked': False, 'disliked': False})
+
+
+class CompressedContentTests(TestCase):
+    '''Post content is stored compressed and kept out of list queries.'''
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass', role='1')
+        self.post = Post.objects.create(
+            author=self.author, title='Long', content='dear diary ' * 500,
+            is_public=True, category='books',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_content_is_stored_compressed(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM diaries_post')
+            stored = bytes(cursor.fetchone()[0])
+        self.assertTrue(stored.startswith(b'z'))
+        self.assertLess(len(stored), len(self.post.content))
+        self.assertEqual(Post.objects.get().content, 'dear diary ' * 500)
+
+    def test_list_omits_content_and_detail_includes_it(self):
+        response = self.client.get(reverse('post_list'))
+        self.assertNotIn('content', response.data[0])
+        response = self.client.get(reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(response.data['content'], 'dear diary ' * 500)
+
+    def test_content_defaults_to_empty_text(self):
+        post = Post(author=self.author, title='Empty', is_public=True, category='books')
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.content, '')
+        with self.assertRaises(TypeError):
+            Post.objects.filter(uuid=post.uuid).update(content=b'raw')
+
+    def test_reactions_do_not_touch_content(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('post_like', kwargs={'uuid': self.post.uuid}))
+        self.assertFalse([query for query in queries if '"content"' in query['sql']])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes, self.post.content), (1, 'dear diary ' * 500))
+
+
+class PostDeltaTests(TestCase):
+    '''Delta edits apply against a base revision and are stored compactly.'''
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass', role='1')
+        self.post = Post.objects.create(
+            author=self.author, title='Draft', content='Hello world',
+            is_public=True, category='books',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.url = reverse('post_update_delta', kwargs={'uuid': self.post.uuid})
+
+    def test_apply_delta(self):
+        self.assertEqual(apply_delta('Hello world', [[0, 5, 'Goodbye'], [11, 0, '!']]), 'Goodbye world!')
+        with self.assertRaises(DeltaError):
+            apply_delta('Hello', [[3, 0, 'x'], [1, 0, 'y']])
+        with self.assertRaises(DeltaError):
+            apply_delta('Hello', [[True, False, 'x']])
+
+    def test_positions_are_utf16_code_units(self):
+        # Like JavaScript's 'I \u{1F49B} tea'.indexOf('tea') == 5: the emoji takes two code units.
+        self.assertEqual(apply_delta('I \U0001F49B tea', [[5, 3, 'coffee']]), 'I \U0001F49B coffee')
+        with self.assertRaises(DeltaError):
+            apply_delta('I \U0001F49B tea', [[3, 0, 'x']])
+
+    def test_delta_edit_and_history(self):
+        response = self.client.patch(self.url, {'base_revision': 0, 'ops': [[5, 6, ', diary']]}, format='json')
+        self.assertEqual(response.data, {'revision': 1})
+        response = self.client.patch(self.url, {'base_revision': 1, 'ops': [[12, 0, '!']]}, format='json')
+        self.assertEqual(response.data, {'revision': 2})
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content, 'Hello, diary!')
+        self.assertEqual(self.post.content_at(0), 'Hello world')
+        self.assertEqual(self.post.content_at(1), 'Hello, diary')
+        self.assertIsNone(PostRevision.objects.get(post=self.post, number=2).snapshot)
+
+    def test_full_updates_store_a_delta(self):
+        url = reverse('post_update', kwargs={'uuid': self.post.uuid})
+        self.client.put(url, {'content': 'Hello \U0001F30D world'}, format='json')
+        revision = PostRevision.objects.get(post=self.post, number=1)
+        self.assertEqual((revision.delta, revision.snapshot), ([[6, 0, '\U0001F30D ']], None))
+        self.assertEqual(self.post.content_at(1), 'Hello \U0001F30D world')
+
+    def test_plain_saves_are_recorded(self):
+        self.post.content = 'Hello there'
+        self.post.save()
+        self.client.patch(self.url, {'base_revision': 1, 'ops': [[11, 0, '!']]}, format='json')
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.revision, 2)
+        self.assertEqual(self.post.content_at(1), 'Hello there')
+        self.assertEqual(self.post.content_at(2), 'Hello there!')
+
+    def test_autosaves_do_not_resign_every_revision(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(self.url, {'base_revision': 0, 'ops': [[11, 0, '!']]}, format='json')
+        self.assertFalse([query for query in queries if 'diaries_contentsignature' in query['sql']])
+
+    def test_stale_base_revision_conflicts(self):
+        self.client.patch(self.url, {'base_revision': 0, 'ops': [[0, 0, 'A ']]}, format='json')
+        response = self.client.patch(self.url, {'base_revision': 0, 'ops': [[0, 0, 'B ']]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data, {'revision': 1})
+
+
+class LocalBroadcasterTests(SimpleTestCase):
+    '''Event fan-out, debouncing, resume and connection limits of the in-process broadcaster.'''
+
+    def test_coalesces_and_resumes(self):
+        async def scenario():
+            broadcaster = LocalBroadcaster(debounce=0.05)
+            listener = broadcaster.subscribe('post:1')
+            for likes in range(5):
+                broadcaster.publish(['post:1'], 'reactions', {'likes': likes}, coalesce_key='reactions:1')
+            broadcaster.publish(['post:1'], 'comment', {'content': 'hi'})
+            first = await asyncio.wait_for(listener.get(), 1)
+            second = await asyncio.wait_for(listener.get(), 1)
+            self.assertEqual(first.name, 'comment')
+            self.assertEqual((second.name, second.payload.count('"likes": 4')), ('reactions', 1))
+            self.assertTrue(listener.queue.empty())
+            listener.close()
+
+            resumed = broadcaster.subscribe('post:1', last_event_id=first.id)
+            self.assertEqual((await resumed.get()).id, second.id)
+            resumed.close()
+
+        asyncio.run(scenario())
+
+    def test_connection_limits(self):
+        async def scenario():
+            broadcaster = LocalBroadcaster(max_connections=3, max_connections_per_user=2)
+            listeners = [broadcaster.subscribe('feed', owner=1) for _ in range(2)]
+            with self.assertRaises(ConnectionLimitExceeded):
+                broadcaster.subscribe('feed', owner=1)
+            listeners.append(broadcaster.subscribe('feed', owner=2))
+            with self.assertRaises(ConnectionLimitExceeded):
+                broadcaster.subscribe('feed', owner=3)
+            listeners[0].close()
+            broadcaster.subscribe('feed', owner=1)
+
+        asyncio.run(scenario())
+
+    def test_histories_are_bounded(self):
+        async def scenario():
+            broadcaster = LocalBroadcaster(history_channels=2)
+            for number in range(3):
+                broadcaster.publish([f'post:{number}'], 'comment', {'number': number})
+            self.assertEqual(list(broadcaster._history), ['post:1', 'post:2'])
+
+            listener = broadcaster.subscribe('post:9', last_event_id=0)
+            listener.close()
+            listener.close()
+            self.assertNotIn('post:9', broadcaster._history)
+            self.assertFalse(broadcaster._listeners)
+
+        asyncio.run(scenario())
+
+    def test_slow_listeners_are_dropped(self):
+        async def scenario():
+            broadcaster = LocalBroadcaster(queue_size=3)
+            listener = broadcaster.subscribe('feed', owner=1)
+            for number in range(4):
+                broadcaster.publish(['feed'], 'comment', {'number': number})
+            self.assertIsNone(await asyncio.wait_for(listener.get(), 1))
+            self.assertTrue(listener.overflowed)
+            self.assertEqual(broadcaster._connections, 0)
+
+            resumed = broadcaster.subscribe('feed', last_event_id=2, owner=1)
+            self.assertEqual([(await resumed.get()).id for _ in range(2)], [3, 4])
+
+        asyncio.run(scenario())
+
+    def test_streams_require_asgi(self):
+        response = self.client.get(reverse('feed_events'))
+        self.assertEqual(response.status_code, 503)
+
+
+class SimilarPostsTests(TestCase):
+    '''The similar posts index is built offline and kept current by the post views.'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SIMILAR_POSTS_INDEX_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.author = User.objects.create_user(username='author', password='pass', role='1')
+        self.hiking = Post.objects.create(
+            author=self.author, title='Hiking', content='mountain trail hiking boots summit views',
+            is_public=True, category='traveling',
+        )
+        Post.objects.create(
+            author=self.author, title='Baking', content='flour sugar oven bread recipe dough',
+            is_public=True, category='cooking',
+        )
+        call_command('build_similar_posts_index', stdout=io.StringIO())
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def similar(self, post_uuid, **params):
+        return self.client.get(reverse('post_similar', kwargs={'uuid': post_uuid}), params)
+
+    def test_new_posts_are_indexed_incrementally(self):
+        response = self.client.post(reverse('post_create'), {
+            'author': self.author.pk, 'title': 'Summit', 'content': 'another mountain trail to the summit',
+            'is_public': True, 'category': 'sport',
+        })
+        new_uuid = response.data['uuid']
+
+        response = self.similar(self.hiking.uuid)
+        self.assertEqual(response.data[0]['uuid'], new_uuid)
+        response = self.similar(self.hiking.uuid, category='cooking')
+        self.assertEqual([post['title'] for post in response.data], ['Baking'])
+
+        self.client.delete(reverse('post_delete', kwargs={'uuid': new_uuid}))
+        response = self.similar(self.hiking.uuid)
+        self.assertNotIn(new_uuid, [post['uuid'] for post in response.data])
+
+    def test_source_post_must_be_visible(self):
+        stranger = User.objects.create_user(username='stranger', password='pass', role='1')
+        diary = Post.objects.create(
+            author=stranger, title='Diary', content='mountain trail hiking notes', is_public=False, category='traveling',
+        )
+        self.assertEqual(self.similar(diary.uuid).status_code, 404)
+
+        self.client.delete(reverse('post_delete', kwargs={'uuid': self.hiking.uuid}))
+        self.assertEqual(self.similar(self.hiking.uuid).status_code, 404)
+
+    def test_build_grows_and_applies_concurrent_edits(self):
+        path = Path(settings.SIMILAR_POSTS_INDEX_DIR)
+        late = Post.objects.create(
+            author=self.author, title='Late', content='trail running', is_public=True, category='sport',
+        )
+
+        def posts():
+            for number in range(1500):
+                yield SimpleNamespace(uuid=uuid.uuid4(), title='Filler', content=f'word{number}', category='art')
+            # Indexed into the old files while the new ones are being built.
+            SimilarPostsIndex(path).upsert(late)
+
+        index = SimilarPostsIndex.build(path, posts(), 0, 64, changed=lambda: [late])
+        self.assertEqual(index.size, 1501)
+        self.assertEqual(index.row_of(late.uuid), 1500)
+
+    def test_workers_append_at_the_current_size(self):
+        path = Path(settings.SIMILAR_POSTS_INDEX_DIR)
+        first, second = SimilarPostsIndex(path), SimilarPostsIndex(path)
+        posts = [
+            Post.objects.create(author=self.author, title=title, content=title, is_public=True, category='sport')
+            for title in ('Running', 'Rowing')
+        ]
+        stat = (path / 'meta.json').stat()
+        first.upsert(posts[0])
+        # A filesystem with coarse timestamps would not show that meta.json changed.
+        os.utime(path / 'meta.json', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        second.upsert(posts[1])
+
+        index = SimilarPostsIndex(path)
+        self.assertEqual(index.size, 4)
+        self.assertEqual({index.row_of(post.uuid) for post in posts}, {2, 3})
+
+
+class NearDuplicateTests(TestCase):
+    '''Lightly varied copies of existing text are flagged, or rejected when configured.'''
+
+    SPAM = (
+        'Buy cheap watches online today at the best prices you will ever find, with free shipping '
+        'worldwide and a money back guarantee on every order, so visit our shop now and pick a '
+        'gift for yourself or your friends before this limited offer ends'
+    )
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass', role='1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def create_post(self, content):
+        return self.client.post(reverse('post_create'), {
+            'author': self.author.pk, 'title': 'Deal', 'content': content,
+            'is_public': True, 'category': 'social',
+        })
+
+    def test_near_duplicates_are_flagged(self):
+        original = self.create_post(self.SPAM).data['uuid']
+        copy = self.create_post(self.SPAM.replace('today', 'tonight')).data['uuid']
+        self.create_post('A quiet evening walk by the lake, thinking about the week and what comes next')
+
+        signature = ContentSignature.objects.get(object_uuid=copy)
+        self.assertEqual(str(signature.duplicate_of), original)
+        self.assertGreaterEqual(signature.similarity, 0.8)
+        self.assertEqual(ContentSignature.objects.filter(duplicate_of__isnull=False).count(), 1)
+
+    @override_settings(NEAR_DUPLICATE_REJECT=True)
+    def test_near_duplicates_are_rejected_when_configured(self):
+        self.create_post(self.SPAM)
+        response = self.create_post(self.SPAM + '!!')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_minhash_of_long_text_is_computed_in_chunks(self):
+        text = ' '.join(f'word{number}' for number in range(3 * duplicates.CHUNK_SHINGLES))
+        hashed = duplicates.shingles(text, 3)
+        a, b = duplicates._permutations(128)
+        expected = ((hashed[:, None] * a + b) & duplicates.MASK32).min(axis=0).astype('<u4')
+        self.assertTrue((minhash(text) == expected).all())
+
+    @override_settings(NEAR_DUPLICATE_MAX_CANDIDATES=1)
+    def test_candidates_sharing_most_bands_are_compared_first(self):
+        signature = minhash(self.SPAM)
+        band, bucket = band_buckets(signature)[0]
+        for _ in range(3):
+            decoy = ContentSignature.objects.create(
+                kind='post', object_uuid=uuid.uuid4(), signature=bytes(signature.nbytes),
+            )
+            SignatureBand.objects.create(signature=decoy, band=band, bucket=bucket)
+
+        original = self.create_post(self.SPAM).data['uuid']
+        copy = self.create_post(self.SPAM.replace('today', 'tonight')).data['uuid']
+        self.assertEqual(str(ContentSignature.objects.get(object_uuid=copy).duplicate_of), original)
+
+    def test_cascaded_deletes_drop_signatures(self):
+        post = self.create_post(self.SPAM).data['uuid']
+        self.client.post(reverse('comment_create'), {
+            'author': self.author.pk, 'post': post, 'content': self.SPAM.upper(),
+        })
+        self.assertEqual(ContentSignature.objects.count(), 2)
+
+        self.author.delete()
+        self.assertFalse(ContentSignature.objects.exists())
+        self.assertFalse(SignatureBand.objects.exists())
+
+    def test_build_command_flags_existing_content(self):
+        post = Post.objects.create(
+            author=self.author, title='Deal', content=self.SPAM, is_public=True, category='social',
+        )
+        Comment.objects.create(author=self.author, post=post, content=self.SPAM.upper())
+        call_command('build_duplicate_index', stdout=io.StringIO())
+        self.assertEqual(ContentSignature.objects.filter(duplicate_of=post.uuid).count(), 1)
+
+
+class RequestProfilingTests(TestCase):
+    '''Admins can profile a request on demand and download the capture.'''
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass', role='2')
+        self.member = User.objects.create_user(username='member', password='pass', role='1')
+        self.client = APIClient()
+
+    def authorize(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def test_admin_header_captures_profile(self):
+        self.authorize(self.admin)
+        response = self.client.get(reverse('post_list'), HTTP_X_PROFILE='cprofile')
+        capture_id = response['X-Profile-Id']
+
+        detail = self.client.get(reverse('profile_detail', kwargs={'capture_id': capture_id}))
+        self.assertEqual(detail.data['path'], reverse('post_list'))
+        self.assertGreaterEqual(detail.data['query_count'], 1)
+        self.assertIn('cumulative', detail.data['top_functions'])
+
+        download = self.client.get(
+            reverse('profile_download', kwargs={'capture_id': capture_id}), {'output': 'collapsed'}
+        )
+        self.assertIn(b';', download.content)
+
+    async def test_async_requests_are_profiled(self):
+        token = AccessToken.for_user(self.admin)
+        response = await self.async_client.get(
+            reverse('post_list'), headers={'Authorization': f'Bearer {token}', 'X-Profile': 'sampling'}
+        )
+        capture = captures.get(response['X-Profile-Id'])
+        self.assertEqual((capture.mode, capture.status), ('sampling', 200))
+        self.assertGreaterEqual(len(capture.queries), 1)
+
+    async def test_async_cprofile_covers_views_and_orm(self):
+        token = AccessToken.for_user(self.admin)
+        response = await self.async_client.get(
+            reverse('post_list'), headers={'Authorization': f'Bearer {token}', 'X-Profile': 'cprofile'}
+        )
+        capture = captures.get(response['X-Profile-Id'])
+        self.assertEqual(capture.mode, 'cprofile')
+        filenames = {filename for filename, _, _ in capture.stats}
+        self.assertTrue(any('rest_framework' in filename for filename in filenames))
+        self.assertTrue(any('django/db' in filename for filename in filenames))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_MODE='cprofile')
+    def test_overlapping_requests_share_cprofile(self):
+        both_running = threading.Barrier(2)
+
+        def view(request):
+            both_running.wait(timeout=5)
+            return HttpResponse()
+
+        middleware = RequestProfilingMiddleware(view)
+        with ThreadPoolExecutor(2) as pool:
+            responses = list(pool.map(middleware, [RequestFactory().get('/diaries/post/list/')] * 2))
+        modes = sorted(captures.get(response['X-Profile-Id']).mode for response in responses)
+        self.assertEqual(modes, ['cprofile', 'sampling'])
+
+    def test_members_cannot_profile(self):
+        self.authorize(self.member)
+        response = self.client.get(reverse('post_list'), HTTP_X_PROFILE='cprofile')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get(reverse('profile_list')).status_code, 403)
+
+
+class SchemaViewTests(SimpleTestCase):
+    '''The OpenAPI schema is served from the prebuilt file, and only generated on request in DEBUG.'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.schema_file = Path(directory.name) / 'schema.yml'
+        settings_override = override_settings(SCHEMA_FILE=self.schema_file)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_prebuilt_schema_is_served_with_etag(self):
+        self.schema_file.write_text('openapi: 3.0.3\n')
+        response = self.client.get(reverse('schema'))
+        self.assertEqual(response.content, b'openapi: 3.0.3\n')
+        self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi')
+
+        response = self.client.get(reverse('schema'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(DEBUG=False)
+    def test_missing_schema_is_not_generated_outside_debug(self):
+        self.assertEqual(self.client.get(reverse('schema')).status_code, 404)
+
+    @override_settings(DEBUG=True)
+    def test_missing_schema_is_generated_in_debug(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            response = self.client.get(reverse('schema'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'openapi:', response.content)
+
+
+class FollowGraphTests(TestCase):
+    '''Follower lists are keyset-paginated with a constant number of queries per page.'''
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass', role='1')
+        self.followers = [
+            User.objects.create_user(username=f'follower{i}', password='pass', role='1') for i in range(7)
+        ]
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=follower, subscribed_to=self.author) for follower in self.followers
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.followers[0])
+
+    def test_followers_keyset_pagination(self):
+        url = reverse('user_followers', kwargs={'pk': self.author.pk})
+        seen, cursor = [], 0
+        while cursor is not None:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'cursor': cursor, 'limit': 3})
+            seen += [user['id'] for user in response.data['results']]
+            cursor = response.data['next_cursor']
+        self.assertEqual(seen, [follower.pk for follower in self.followers])
+
+    def test_subscribe_mutual_and_batch_status(self):
+        response = self.client.post(reverse('subscribe', kwargs={'pk': self.followers[1].pk}))
+        self.assertEqual(response.status_code, 201)
+        Subscription.objects.create(subscriber=self.followers[1], subscribed_to=self.followers[0])
+
+        response = self.client.get(reverse('user_mutual', kwargs={'pk': self.followers[1].pk}))
+        self.assertEqual(response.data, {'following': True, 'followed_by': True, 'mutual': True})
+
+        ids = [self.author.pk, self.followers[1].pk, self.followers[2].pk]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('following_status'), {'ids': ids}, format='json')
+        self.assertEqual(response.data, {str(ids[0]): True, str(ids[1]): True, str(ids[2]): False})
@@ -1,21 +1,30 @@
 from django.urls import path
 
 from .views import (
-    CreatePostView, ListPostView, ListMyPostView, UpdatePostView,
-    DeletePostView, SubscribeView, UnsubscribeView, FilterPostsView,
+    CreatePostView, ListPostView, RetrievePostView, ListMyPostView, UpdatePostView,
+    PostDeltaView, DeletePostView, SubscribeView, UnsubscribeView, FilterPostsView,
     CreateCommentView, CommentsListView, CommentUpdateView,
-    CommentDeleteView, LikeView, DislikeView,
+    CommentDeleteView, LikeView, DislikeView, ReactionStatusView,
+    PostEventStreamView, FeedEventStreamView, SimilarPostsView,
+    FollowersView, FollowingView, MutualFollowView, FollowStatusView,
 )
 
 
 urlpatterns = [
     path('post/create/', CreatePostView.as_view(), name='post_create'),
     path('post/list/', ListPostView.as_view(), name='post_list'),
+    path('post/<uuid:uuid>/', RetrievePostView.as_view(), name='post_detail'),
+    path('post/<uuid:uuid>/similar/', SimilarPostsView.as_view(), name='post_similar'),
     path('my_post/list/', ListMyPostView.as_view(), name='my_post_list'),
     path('post/delete/<uuid:uuid>/', DeletePostView.as_view(), name='post_delete'),
     path('post/update/<uuid:uuid>/', UpdatePostView.as_view(), name='post_update'),
-    path('subscribe/<uuid:uuid>/', SubscribeView.as_view(), name='subscribe'),
-    path('unsubscribe/<uuid:uuid>/', UnsubscribeView.as_view(), name='unsubscribe'),
+    path('post/update/<uuid:uuid>/delta/', PostDeltaView.as_view(), name='post_update_delta'),
+    path('subscribe/<int:pk>/', SubscribeView.as_view(), name='subscribe'),
+    path('unsubscribe/<int:pk>/', UnsubscribeView.as_view(), name='unsubscribe'),
+    path('users/<int:pk>/followers/', FollowersView.as_view(), name='user_followers'),
+    path('users/<int:pk>/following/', FollowingView.as_view(), name='user_following'),
+    path('users/<int:pk>/mutual/', MutualFollowView.as_view(), name='user_mutual'),
+    path('users/following/status/', FollowStatusView.as_view(), name='following_status'),
     path('post/filter/<str:category_name>/', FilterPostsView.as_view(), name='post_filter'),
     path('comment/create/', CreateCommentView.as_view(), name='comment_create'),
     path('comments/', CommentsListView.as_view(), name='comments_list'),
@@ -23,4 +32,7 @@ urlpatterns = [
     path('comment/delete/<uuid:uuid>/', CommentDeleteView.as_view(), name='comment_delete'),
     path('post/like/<uuid:uuid>/', LikeView.as_view(), name='post_like'),
     path('post/dislike/<uuid:uuid>/', DislikeView.as_view(), name='post_dislike'),
+    path('post/reactions/', ReactionStatusView.as_view(), name='post_reactions'),
+    path('post/<uuid:uuid>/events/', PostEventStreamView.as_view(), name='post_events'),
+    path('feed/events/', FeedEventStreamView.as_view(), name='feed_events'),
 ]
\ No newline at end of file
@@ -1,16 +1,52 @@
+import asyncio
+
+from typing import TYPE_CHECKING
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404, HttpRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views import View
 
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
 from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from drf_spectacular.utils import extend_schema
 
-from .models import Post, Subscription, User, Comment, Like, Dislike
-from .serializers import PostSerializer, CommentSerializer
+from .deltas import DeltaError, apply_delta
+from .events import (
+    FEED_CHANNEL, ConnectionLimitExceeded, get_broadcaster, post_channel,
+    publish_comment, publish_reactions,
+)
+from .models import Post, PostRevision, Subscription, User, Comment, Like, Dislike
+from .serializers import (
+    PostSerializer, PostListSerializer, CommentSerializer, ReactionStatusSerializer,
+    PostDeltaSerializer, UserSummarySerializer, FollowStatusSerializer,
+)
+
+if TYPE_CHECKING:
+    from .duplicates import Screening
+
+# `.similarity` and `.duplicates` need numpy, so views import them where they are used to keep
+# loading the URLconf cheap.
+
+
+def screen_content(text: str, exclude=None) -> 'Screening':
+    '''Check text for near-duplicates, rejecting it when `NEAR_DUPLICATE_REJECT` is on.'''
+
+    from .duplicates import screen
+    screening = screen(text, exclude=exclude)
+    if screening.should_reject:
+        raise ValidationError({'content': ['This looks like a copy of existing content.']})
+    return screening
 
 
 # ------------ Post Views ------------
@@ -23,26 +59,55 @@ class CreatePostView(generics.CreateAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_create(self, serializer: PostSerializer) -> None:
+        screening = screen_content(serializer.validated_data['content'])
+        post = serializer.save()
+        from .duplicates import save_signature
+        save_signature('post', post.uuid, screening)
+        from .similarity import index_post
+        index_post(post)
+
 
 @extend_schema(tags=['Posts'])
 class ListPostView(generics.ListAPIView):
     '''List all publicly available posts.'''
 
-    queryset = Post.objects.filter(is_public=True)
+    serializer_class = PostListSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Post.objects.filter(is_public=True).defer('content').with_viewer_reactions(self.request.user)
+
+
+@extend_schema(tags=['Posts'])
+class RetrievePostView(generics.RetrieveAPIView):
+    '''Retrieve a single post with its content (public, or own/admin for private posts).'''
+
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    lookup_field = 'uuid'
+
+    def get_queryset(self):
+        return Post.objects.with_viewer_reactions(self.request.user)
+
+    def get_object(self) -> Post:
+        post = super().get_object()
+        user = self.request.user
+        if not post.is_public and user != post.author and user.role != '2':
+            raise PermissionDenied('You do not have permission to view this post.')
+        return post
 
 
 @extend_schema(tags=['Posts'])
 class ListMyPostView(generics.ListAPIView):
     '''List posts authored by the authenticated user.'''
 
-    serializer_class = PostSerializer
+    serializer_class = PostListSerializer
     permission_classes = [IsAuthenticated]
 
     def get(self, request: Request) -> Response:
-        posts = Post.objects.filter(author=request.user)
-        serializer = PostSerializer(posts, many=True)
+        posts = Post.objects.filter(author=request.user).defer('content').with_viewer_reactions(request.user)
+        serializer = PostListSerializer(posts, many=True)
         return Response(serializer.data)
 
 
@@ -50,20 +115,73 @@ class ListMyPostView(generics.ListAPIView):
 class UpdatePostView(generics.UpdateAPIView):
     '''Update a post (author or admin only).'''
 
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_for_update()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'uuid'
 
+    @transaction.atomic
     def put(self, request: Request, *args, **kwargs) -> Response:
         post = self.get_object()
         if request.user != post.author and request.user.role != '2':
             raise PermissionDenied('You do not have permission to edit this post.')
         serializer = self.get_serializer(instance=post, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
+        content = serializer.validated_data.pop('content', None)
+        if content == post.content:
+            content = None
+        screening = screen_content(content, exclude=post.uuid) if content is not None else None
         self.perform_update(serializer)
+        if content is not None:
+            post.save_revision(content)
+            from .duplicates import save_signature
+            save_signature('post', post.uuid, screening)
+        from .similarity import index_post
+        index_post(post)
         return Response(serializer.data)
 
+    def patch(self, request: Request, *args, **kwargs) -> Response:
+        return self.put(request, *args, **kwargs)
+
+
+@extend_schema(tags=['Posts'], request=PostDeltaSerializer)
+class PostDeltaView(APIView):
+    '''
+    Apply a text delta against a base revision of a post (author or admin only).
+
+    Positions and counts are UTF-16 code units, as in JavaScript strings. Near-duplicate
+    screening and the similar posts index catch up every `PostRevision.SNAPSHOT_INTERVAL`
+    revisions rather than on every delta.
+    '''
+
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request: Request, uuid: str) -> Response:
+        serializer = PostDeltaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        base_revision = serializer.validated_data['base_revision']
+        ops = serializer.validated_data['ops']
+        with transaction.atomic():
+            post = get_object_or_404(Post.objects.select_for_update(), uuid=uuid)
+            if request.user != post.author and request.user.role != '2':
+                raise PermissionDenied('You do not have permission to edit this post.')
+            if post.revision != base_revision:
+                return Response({'revision': post.revision}, status=status.HTTP_409_CONFLICT)
+            try:
+                content = apply_delta(post.content, ops)
+            except DeltaError as e:
+                return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+            refresh = (post.revision + 1) % PostRevision.SNAPSHOT_INTERVAL == 0
+            screening = screen_content(content, exclude=post.uuid) if refresh else None
+            post.save_revision(content, delta=ops)
+            if refresh:
+                from .duplicates import save_signature
+                save_signature('post', post.uuid, screening)
+        if refresh:
+            from .similarity import index_post
+            index_post(post)
+        return Response({'revision': post.revision})
+
 
 @extend_schema(tags=['Posts'])
 class DeletePostView(generics.DestroyAPIView):
@@ -77,18 +195,51 @@ class DeletePostView(generics.DestroyAPIView):
         post = self.get_object()
         if request.user != post.author and request.user.role != '2':
             raise PermissionDenied('You do not have permission to delete this post.')
+        from .similarity import unindex_post
+        unindex_post(post.uuid)
         post.delete()
         return Response('Post deleted successfully.', status=status.HTTP_204_NO_CONTENT)
 
 
+@extend_schema(tags=['Posts'])
+class SimilarPostsView(APIView):
+    '''List public posts similar to a visible post (`?k=` up to 50, optional `?category=`).'''
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request, uuid) -> Response:
+        post = get_object_or_404(Post.objects.only('author_id', 'is_public'), uuid=uuid)
+        if not post.is_public and post.author_id != request.user.pk and request.user.role != '2':
+            raise Http404('No Post matches the given query.')
+
+        from .similarity import get_index
+        index = get_index()
+        if index is None:
+            return Response('Similar posts are not available yet.', status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 50)
+        except ValueError:
+            return Response('k must be an integer.', status=status.HTTP_400_BAD_REQUEST)
+        category = request.query_params.get('category')
+        if category is not None and category not in dict(Post.CATEGORY):
+            return Response('Unknown category.', status=status.HTTP_400_BAD_REQUEST)
+
+        matches = index.most_similar([uuid], k=k, category=category)[uuid]
+        posts = Post.objects.filter(
+            uuid__in=[match for match, _ in matches], is_public=True
+        ).defer('content').with_viewer_reactions(request.user).in_bulk()
+        ordered = [posts[match] for match, _ in matches if match in posts]
+        return Response(PostListSerializer(ordered, many=True).data)
+
+
 @extend_schema(tags=['Subscriptions'])
 class SubscribeView(APIView):
     '''Subscribe to another user.'''
 
     permission_classes = [IsAuthenticated]
 
-    def post(self, request: Request, uuid: str) -> Response:
-        target = get_object_or_404(User, uuid=uuid)
+    def post(self, request: Request, pk: int) -> Response:
+        target = get_object_or_404(User, pk=pk)
         subscriber = request.user
         if target == subscriber:
             return Response('Cannot subscribe to yourself.', status=status.HTTP_400_BAD_REQUEST)
@@ -106,8 +257,8 @@ class UnsubscribeView(APIView):
 
     permission_classes = [IsAuthenticated]
 
-    def delete(self, request: Request, uuid: str) -> Response:
-        target = get_object_or_404(User, uuid=uuid)
+    def delete(self, request: Request, pk: int) -> Response:
+        target = get_object_or_404(User, pk=pk)
         user = request.user
         if target == user:
             return Response('Cannot unsubscribe from yourself.', status=status.HTTP_400_BAD_REQUEST)
@@ -118,6 +269,86 @@ class UnsubscribeView(APIView):
         return Response('Successfully unsubscribed.', status=status.HTTP_204_NO_CONTENT)
 
 
+class FollowGraphPageView(APIView):
+    '''
+    Base view for keyset-paginated follower/following lists.
+
+    Pages are ordered by user id; pass the returned `next_cursor` as `?cursor=` to get the next
+    page and `?limit=` (up to 200) to size it. Each page is one range scan over a composite
+    subscription index joined to the listed users, however many subscriptions the user has.
+    '''
+
+    permission_classes = [IsAuthenticated]
+    user_field = None
+    owner_field = None
+
+    def get(self, request: Request, pk: int) -> Response:
+        get_object_or_404(User.objects.only('pk'), pk=pk)
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response('cursor and limit must be integers.', status=status.HTTP_400_BAD_REQUEST)
+
+        users = list(
+            Subscription.objects.filter(**{self.owner_field: pk, f'{self.user_field}_id__gt': cursor})
+            .order_by(f'{self.user_field}_id')
+            .values(id=F(f'{self.user_field}_id'), username=F(f'{self.user_field}__username'))[:limit + 1]
+        )
+        next_cursor = users[limit - 1]['id'] if len(users) > limit else None
+        return Response({'results': UserSummarySerializer(users[:limit], many=True).data, 'next_cursor': next_cursor})
+
+
+@extend_schema(tags=['Subscriptions'])
+class FollowersView(FollowGraphPageView):
+    '''List the users subscribed to a user.'''
+
+    user_field = 'subscriber'
+    owner_field = 'subscribed_to_id'
+
+
+@extend_schema(tags=['Subscriptions'])
+class FollowingView(FollowGraphPageView):
+    '''List the users a user is subscribed to.'''
+
+    user_field = 'subscribed_to'
+    owner_field = 'subscriber_id'
+
+
+@extend_schema(tags=['Subscriptions'])
+class MutualFollowView(APIView):
+    '''Check whether the current user and another user follow each other.'''
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request, pk: int) -> Response:
+        edges = set(
+            Subscription.objects.filter(
+                Q(subscriber=request.user, subscribed_to_id=pk) | Q(subscriber_id=pk, subscribed_to=request.user)
+            ).values_list('subscriber_id', flat=True)
+        )
+        following = request.user.pk in edges
+        followed_by = pk in edges
+        return Response({'following': following, 'followed_by': followed_by, 'mutual': following and followed_by})
+
+
+@extend_schema(tags=['Subscriptions'], request=FollowStatusSerializer)
+class FollowStatusView(APIView):
+    '''Return whether the current user follows each user in a batch of user ids.'''
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        serializer = FollowStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        followed = set(
+            Subscription.objects.filter(subscriber=request.user, subscribed_to_id__in=ids)
+            .values_list('subscribed_to_id', flat=True)
+        )
+        return Response({str(user_id): user_id in followed for user_id in ids})
+
+
 @extend_schema(tags=['Posts'])
 class FilterPostsView(APIView):
     '''Filter public posts by category.'''
@@ -125,8 +356,10 @@ class FilterPostsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request: Request, category_name: str) -> Response:
-        posts = Post.objects.filter(category=category_name, is_public=True)
-        serializer = PostSerializer(posts, many=True)
+        posts = Post.objects.filter(
+            category=category_name, is_public=True
+        ).defer('content').with_viewer_reactions(request.user)
+        serializer = PostListSerializer(posts, many=True)
         return Response(serializer.data)
 
 
@@ -140,6 +373,13 @@ class CreateCommentView(generics.CreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_create(self, serializer: CommentSerializer) -> None:
+        screening = screen_content(serializer.validated_data['content'])
+        comment = serializer.save()
+        from .duplicates import save_signature
+        save_signature('comment', comment.uuid, screening)
+        publish_comment(comment, serializer.data)
+
 
 @extend_schema(tags=['Comments'])
 class CommentsListView(generics.ListAPIView):
@@ -166,6 +406,16 @@ class CommentUpdateView(generics.UpdateAPIView):
             raise PermissionDenied('You do not have permission to edit this comment.')
         return comment
 
+    def perform_update(self, serializer: CommentSerializer) -> None:
+        content = serializer.validated_data.get('content')
+        if content is None or content == serializer.instance.content:
+            serializer.save()
+            return
+        screening = screen_content(content, exclude=serializer.instance.uuid)
+        comment = serializer.save()
+        from .duplicates import save_signature
+        save_signature('comment', comment.uuid, screening)
+
 
 @extend_schema(tags=['Comments'])
 class CommentDeleteView(APIView):
@@ -191,12 +441,13 @@ class LikeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request: Request, uuid: str) -> Response:
-        post = get_object_or_404(Post, uuid=uuid)
+        post = get_object_or_404(Post.objects.defer('content'), uuid=uuid)
         like, created = Like.objects.get_or_create(post=post, author=request.user)
         if not created:
             return Response('Already liked this post.', status=status.HTTP_400_BAD_REQUEST)
         post.likes += 1
-        post.save()
+        post.save(update_fields=['likes'])
+        publish_reactions(post)
         return Response('Post liked.', status=status.HTTP_201_CREATED)
 
 
@@ -207,10 +458,120 @@ class DislikeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request: Request, uuid: str) -> Response:
-        post = get_object_or_404(Post, uuid=uuid)
+        post = get_object_or_404(Post.objects.defer('content'), uuid=uuid)
         dislike, created = Dislike.objects.get_or_create(post=post, author=request.user)
         if not created:
             return Response('Already disliked this post.', status=status.HTTP_400_BAD_REQUEST)
         post.dislikes += 1
-        post.save()
-        return Response('Post disliked.', status=status.HTTP_201_CREATED)
\ No newline at end of file
+        post.save(update_fields=['dislikes'])
+        publish_reactions(post)
+        return Response('Post disliked.', status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['Reactions'], request=ReactionStatusSerializer)
+class ReactionStatusView(APIView):
+    '''Return the current user's like/dislike state for a batch of posts.'''
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        serializer = ReactionStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        uuids = serializer.validated_data['uuids']
+        liked = set(
+            Like.objects.filter(author=request.user, post_id__in=uuids).values_list('post_id', flat=True)
+        )
+        disliked = set(
+            Dislike.objects.filter(author=request.user, post_id__in=uuids).values_list('post_id', flat=True)
+        )
+        data = {
+            str(post_uuid): {'liked': post_uuid in liked, 'disliked': post_uuid in disliked}
+            for post_uuid in uuids
+        }
+        return Response(data)
+
+
+# ------------ Event Stream Views ------------
+
+class EventStreamView(View):
+    '''
+    Base view streaming one broadcaster channel as server-sent events.
+
+    Streams are async and must be served through ASGI (`mind_stream.asgi`). Clients authenticate
+    with the usual JWT header and resume after a reconnect by sending `Last-Event-ID`.
+    '''
+
+    channel = None
+    heartbeat = 15
+
+    async def get_channel(self, user: User, **kwargs) -> str:
+        '''Return the channel to stream; override for channels that depend on the request.'''
+
+        if self.channel is None:
+            raise ImproperlyConfigured(
+                f'{type(self).__name__} is missing a channel. '
+                f'Define {type(self).__name__}.channel or override {type(self).__name__}.get_channel().'
+            )
+        return self.channel
+
+    async def get(self, request: HttpRequest, **kwargs) -> StreamingHttpResponse | JsonResponse:
+        if not isinstance(request, ASGIRequest):
+            # Under WSGI the stream would hold a worker thread forever without sending a byte.
+            return JsonResponse(
+                {'detail': 'Event streams require an ASGI server.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        try:
+            auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if auth is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        user = auth[0]
+        channel = await self.get_channel(user, **kwargs)
+
+        last_event_id = request.headers.get('Last-Event-ID')
+        last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        try:
+            listener = get_broadcaster().subscribe(channel, last_event_id, owner=user.pk)
+        except ConnectionLimitExceeded as e:
+            return JsonResponse({'detail': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        response = StreamingHttpResponse(self.stream(listener), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, listener):
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(listener.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                else:
+                    if event is None:
+                        return
+                    yield event.payload
+        finally:
+            listener.close()
+
+
+class PostEventStreamView(EventStreamView):
+    '''Stream reaction count changes and new comments for one post.'''
+
+    async def get_channel(self, user: User, uuid) -> str:
+        post = await Post.objects.only('author_id', 'is_public').filter(uuid=uuid).afirst()
+        if post is None or (not post.is_public and post.author_id != user.pk and user.role != '2'):
+            raise Http404('No Post matches the given query.')
+        return post_channel(uuid)
+
+
+class FeedEventStreamView(EventStreamView):
+    '''Stream reaction count changes and new comments for all public posts.'''
+
+    channel = FEED_CHANNEL
@@ -0,0 +1,311 @@
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+
+from collections import Counter, deque
+from contextlib import ExitStack
+from typing import Callable
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class Capture:
+    '''One profiled request: timings, SQL queries and the profiler output.'''
+
+    def __init__(self, request: HttpRequest, mode: str):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.started_at = time.time()
+        self.status = None
+        self.duration = None
+        self.queries = []
+        self.stats = None
+        self.stacks = Counter()
+
+    def summary(self) -> dict:
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 2),
+            'query_count': len(self.queries),
+            'query_ms': round(sum(query['duration_ms'] for query in self.queries), 2),
+        }
+
+    def top_functions(self, limit: int = 30) -> str:
+        '''Render the slowest functions by cumulative time, as printed by pstats.'''
+
+        if self.stats is None:
+            return ''
+        output = io.StringIO()
+        stats = pstats.Stats(_StatsSource(dict(self.stats)), stream=output)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def pstats_bytes(self) -> bytes:
+        '''The capture in the binary format written by `cProfile` and read by `pstats.Stats`.'''
+
+        return marshal.dumps(self.stats)
+
+    def collapsed(self) -> str:
+        '''The capture as collapsed stacks (`frame;frame;frame count`), the input of flamegraph tools.'''
+
+        if self.stacks:
+            return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+        return _collapse_stats(self.stats or {})
+
+
+class _StatsSource:
+    '''Adapter letting `pstats.Stats` load an already-created stats dict.'''
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def _label(code) -> str:
+    filename, line, name = code
+    return f'{filename}:{line}({name})' if line else name
+
+
+def _collapse_stats(stats: dict) -> str:
+    '''Approximate collapsed stacks from cProfile's caller graph (self time, in microseconds).'''
+
+    callers = {func: entry[4] for func, entry in stats.items()}
+    lines = []
+    for func, (_, _, self_time, _, _) in stats.items():
+        stack, seen, current = [func], {func}, func
+        while callers.get(current):
+            current = max(callers[current], key=lambda caller: callers[current][caller][3])
+            if current in seen:
+                break
+            seen.add(current)
+            stack.append(current)
+        weight = int(self_time * 1_000_000)
+        if weight:
+            lines.append(';'.join(_label(frame) for frame in reversed(stack)) + f' {weight}\n')
+    return ''.join(lines)
+
+
+class _StackSampler(threading.Thread):
+    '''Samples the stacks of some threads at a fixed interval into collapsed-stack counts.'''
+
+    def __init__(self, thread_ids: set[int], interval: float, stacks: Counter):
+        super().__init__(daemon=True)
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.stacks = stacks
+        self.done = threading.Event()
+
+    def run(self) -> None:
+        while not self.done.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                labels = []
+                while frame is not None:
+                    code = frame.f_code
+                    labels.append(f'{code.co_filename}:{code.co_firstlineno}({code.co_name})')
+                    frame = frame.f_back
+                if labels:
+                    self.stacks[';'.join(reversed(labels))] += 1
+
+
+class CaptureStore:
+    '''Bounded, process-local ring buffer of the most recent captures.'''
+
+    def __init__(self, size: int):
+        self._captures = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, capture: Capture) -> None:
+        with self._lock:
+            self._captures.append(capture)
+
+    def list(self) -> list[Capture]:
+        with self._lock:
+            return list(reversed(self._captures))
+
+    def get(self, capture_id: str) -> Capture | None:
+        with self._lock:
+            return next((capture for capture in self._captures if capture.id == capture_id), None)
+
+
+captures = CaptureStore(getattr(settings, 'PROFILING_BUFFER_SIZE', 50))
+
+# Since Python 3.12 cProfile runs on sys.monitoring, which admits one active profiler per process.
+_cprofile_lock = threading.Lock()
+
+
+def is_admin(user) -> bool:
+    return bool(user and user.is_authenticated and (user.role == '2' or user.is_superuser))
+
+
+class RequestProfilingMiddleware:
+    '''
+    Profile a sampled fraction of requests, or requests from admins carrying the profiling header.
+
+    `PROFILING_SAMPLE_RATE` (0..1) picks requests at random; an admin can force a capture by
+    sending `PROFILING_HEADER` with `cprofile` or `sampling` as its value. Captures hold either
+    cProfile stats or stack samples taken every `PROFILING_SAMPLING_INTERVAL` seconds, plus the
+    SQL run on every database connection, and are kept in `captures`. Only one request at a time
+    runs under cProfile; requests overlapping it are sampled instead.
+
+    Under ASGI, cProfile runs in the request's executor thread, where sync views, DRF and the ORM
+    run; code awaited on the event loop itself (async views) only shows up in sampling mode,
+    which samples both threads.
+    '''
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = self.capture_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        capture = Capture(request, mode)
+        with ExitStack() as stack:
+            self.record_queries(stack, capture)
+            started = time.perf_counter()
+            stop = self.start_profiler(capture, {threading.get_ident()})
+            try:
+                response = self.get_response(request)
+            finally:
+                stop()
+                capture.duration = time.perf_counter() - started
+        return self.finish(capture, response)
+
+    async def __acall__(self, request: HttpRequest):
+        if request.headers.get(getattr(settings, 'PROFILING_HEADER', 'X-Profile')):
+            # Checking for an admin authenticates the request, which queries the database.
+            mode = await sync_to_async(self.capture_mode)(request)
+        else:
+            mode = self.capture_mode(request)
+        if mode is None:
+            return await self.get_response(request)
+
+        capture = Capture(request, mode)
+        # Sync views, serializers and the ORM run in the executor thread shared by the request's
+        # sync code, so query recording and cProfile are started there rather than on the loop.
+        executor_thread = await sync_to_async(threading.get_ident)()
+        stack = ExitStack()
+        await sync_to_async(self.record_queries)(stack, capture)
+        started = time.perf_counter()
+        try:
+            stop = await sync_to_async(self.start_profiler)(capture, {threading.get_ident(), executor_thread})
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stop)()
+                capture.duration = time.perf_counter() - started
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(capture, response)
+
+    def capture_mode(self, request: HttpRequest) -> str | None:
+        if request.path.startswith(getattr(settings, 'PROFILING_EXCLUDE_PREFIX', '/api/profiles/')):
+            return None
+        requested = request.headers.get(getattr(settings, 'PROFILING_HEADER', 'X-Profile'))
+        if requested and self.is_admin_request(request):
+            return 'sampling' if requested.lower() == 'sampling' else 'cprofile'
+        if random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0):
+            return getattr(settings, 'PROFILING_MODE', 'cprofile')
+        return None
+
+    @staticmethod
+    def is_admin_request(request: HttpRequest) -> bool:
+        try:
+            auth = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return is_admin(auth[0] if auth else getattr(request, 'user', None))
+
+    def start_profiler(self, capture: Capture, thread_ids: set[int]) -> Callable[[], None]:
+        '''
+        Start cProfile on the calling thread, or the stack sampler over `thread_ids`, and return
+        the function that stops it and stores the result in `capture`.
+        '''
+
+        if capture.mode != 'sampling' and not _cprofile_lock.acquire(blocking=False):
+            capture.mode = 'sampling'
+
+        if capture.mode == 'sampling':
+            sampler = _StackSampler(
+                thread_ids, getattr(settings, 'PROFILING_SAMPLING_INTERVAL', 0.001), capture.stacks
+            )
+            sampler.start()
+
+            def stop() -> None:
+                sampler.done.set()
+                sampler.join()
+            return stop
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except BaseException:
+            _cprofile_lock.release()
+            raise
+
+        def stop() -> None:
+            try:
+                profiler.disable()
+            finally:
+                _cprofile_lock.release()
+            profiler.create_stats()
+            capture.stats = profiler.stats
+        return stop
+
+    def record_queries(self, stack: ExitStack, capture: Capture) -> None:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self.query_recorder(capture, connection.alias)))
+
+    @staticmethod
+    def finish(capture: Capture, response: HttpResponse) -> HttpResponse:
+        capture.status = response.status_code
+        if not isinstance(response, StreamingHttpResponse):
+            response['X-Profile-Id'] = capture.id
+        captures.add(capture)
+        return response
+
+    @staticmethod
+    def query_recorder(capture: Capture, alias: str):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                capture.queries.append({
+                    'database': alias,
+                    'sql': sql,
+                    'many': many,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                })
+        return record
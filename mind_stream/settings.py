@@ -19,9 +19,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv('ALLOWED_HOSTS', '').split(',') if host]
+
+# Swagger UI and its bundled assets are only loaded when enabled, to keep worker startup lean.
+API_DOCS_ENABLED = os.getenv('API_DOCS_ENABLED', str(DEBUG)) == 'True'
 
 AUTH_USER_MODEL = 'diaries.User'
 
@@ -41,9 +44,11 @@ INSTALLED_APPS = [
     'rest_framework',
 
     'drf_spectacular',
-    'drf_spectacular_sidecar',
 ]
 
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_spectacular_sidecar')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mind_stream.profiling.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'mind_stream.urls'
@@ -137,3 +143,40 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
+
+# OpenAPI schema, prebuilt with `python manage.py spectacular --file schema.yml`
+SCHEMA_FILE = Path(os.getenv('SCHEMA_FILE', BASE_DIR / 'schema.yml'))
+
+# Post content storage (see diaries.fields.CompressedTextField)
+POST_CONTENT_COMPRESSION = os.getenv('POST_CONTENT_COMPRESSION', 'True') == 'True'
+POST_CONTENT_COMPRESSION_LEVEL = 6
+POST_CONTENT_COMPRESSION_MIN_SIZE = 256
+
+# Server-sent event streams (see diaries.events), served through ASGI
+EVENTS_BROADCASTER = 'diaries.events.LocalBroadcaster'
+EVENTS_HISTORY = 100
+EVENTS_HISTORY_CHANNELS = 10000
+EVENTS_DEBOUNCE = 0.5
+EVENTS_MAX_CONNECTIONS = 1000
+EVENTS_MAX_CONNECTIONS_PER_USER = 5
+EVENTS_QUEUE_SIZE = 100
+
+# Similar posts index (see diaries.similarity), built with `manage.py build_similar_posts_index`
+SIMILAR_POSTS_INDEX_DIR = Path(os.getenv('SIMILAR_POSTS_INDEX_DIR', BASE_DIR / 'var' / 'similar_posts'))
+SIMILAR_POSTS_DIM = 256
+
+# Near-duplicate detection (see diaries.duplicates); rebuild with `manage.py build_duplicate_index`
+# after changing the shingle size, bands or rows.
+NEAR_DUPLICATE_THRESHOLD = 0.8
+NEAR_DUPLICATE_REJECT = os.getenv('NEAR_DUPLICATE_REJECT', 'False') == 'True'
+NEAR_DUPLICATE_SHINGLE_SIZE = 3
+NEAR_DUPLICATE_MIN_SHINGLES = 5
+NEAR_DUPLICATE_BANDS = 16
+NEAR_DUPLICATE_ROWS = 8
+
+# Request profiling (see mind_stream.profiling); captures are browsable at /api/profiles/
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_HEADER = 'X-Profile'
+PROFILING_MODE = 'cprofile'
+PROFILING_SAMPLING_INTERVAL = 0.001
+PROFILING_BUFFER_SIZE = 50
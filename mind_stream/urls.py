@@ -1,12 +1,22 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from .views import SchemaView, ProfileListView, ProfileDetailView, ProfileDownloadView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('diaries/', include('diaries.urls')),
     path('auth/', include('auth.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path('api/schema/', SchemaView.as_view(), name='schema'),
+    path('api/profiles/', ProfileListView.as_view(), name='profile_list'),
+    path('api/profiles/<str:capture_id>/', ProfileDetailView.as_view(), name='profile_detail'),
+    path('api/profiles/<str:capture_id>/download/', ProfileDownloadView.as_view(), name='profile_download'),
 ]
+
+if settings.API_DOCS_ENABLED:
+    from drf_spectacular.views import SpectacularSwaggerView
+
+    urlpatterns.append(
+        path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    )
@@ -0,0 +1,114 @@
+import hashlib
+
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseNotModified
+from django.views import View
+
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_spectacular.utils import extend_schema
+
+from .profiling import Capture, captures, is_admin
+
+
+_schema_cache = {}
+
+
+def _load_schema(path: Path) -> tuple[bytes, str] | None:
+    '''Read the prebuilt schema file, re-reading only when its mtime changes.'''
+
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _schema_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        content = path.read_bytes()
+        etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        cached = _schema_cache[path] = (mtime, content, etag)
+    return cached[1], cached[2]
+
+
+class SchemaView(View):
+    '''
+    Serve the prebuilt OpenAPI schema from `settings.SCHEMA_FILE` with an ETag.
+
+    When the file is missing the schema is generated per request, but only in DEBUG;
+    drf-spectacular's generator is imported lazily so workers do not pay for it at startup.
+    '''
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        path = Path(settings.SCHEMA_FILE)
+        schema = _load_schema(path)
+        if schema is None:
+            if not settings.DEBUG:
+                raise Http404('OpenAPI schema has not been built.')
+            from drf_spectacular.views import SpectacularAPIView
+            return SpectacularAPIView.as_view()(request, *args, **kwargs)
+
+        content, etag = schema
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        content_type = 'application/vnd.oai.openapi+json' if path.suffix == '.json' else 'application/vnd.oai.openapi'
+        return HttpResponse(content, content_type=content_type, headers={'ETag': etag})
+
+
+class ProfileCaptureMixin:
+    '''Admin-only access to the request profiling captures.'''
+
+    permission_classes = [IsAuthenticated]
+
+    def get_capture(self, request: Request, capture_id: str | None = None) -> Capture | None:
+        if not is_admin(request.user):
+            raise PermissionDenied('You do not have permission to view profiles.')
+        if capture_id is None:
+            return None
+        capture = captures.get(capture_id)
+        if capture is None:
+            raise NotFound('Profile not found.')
+        return capture
+
+
+@extend_schema(tags=['Profiling'])
+class ProfileListView(ProfileCaptureMixin, APIView):
+    '''List the most recent request profiles (admin only).'''
+
+    def get(self, request: Request) -> Response:
+        self.get_capture(request)
+        return Response([capture.summary() for capture in captures.list()])
+
+
+@extend_schema(tags=['Profiling'])
+class ProfileDetailView(ProfileCaptureMixin, APIView):
+    '''Show a request profile with its SQL queries and slowest functions (admin only).'''
+
+    def get(self, request: Request, capture_id: str) -> Response:
+        capture = self.get_capture(request, capture_id)
+        return Response({
+            **capture.summary(),
+            'queries': capture.queries,
+            'top_functions': capture.top_functions(),
+        })
+
+
+@extend_schema(tags=['Profiling'])
+class ProfileDownloadView(ProfileCaptureMixin, APIView):
+    '''Download a request profile as pstats (`?output=pstats`) or collapsed stacks (admin only).'''
+
+    def get(self, request: Request, capture_id: str) -> HttpResponse:
+        capture = self.get_capture(request, capture_id)
+        if request.query_params.get('output') == 'pstats':
+            if capture.stats is None:
+                raise NotFound('This profile was captured by stack sampling; download it as collapsed stacks.')
+            content, content_type, extension = capture.pstats_bytes(), 'application/octet-stream', 'prof'
+        else:
+            content, content_type, extension = capture.collapsed(), 'text/plain', 'folded'
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{capture.id}.{extension}"'
+        return response